@@ -1,20 +1,37 @@
-from flask import Flask, request, jsonify, send_from_directory, render_template
-from flask_cors import CORS  # Tambahkan ini
-from keras.models import load_model
-from keras.preprocessing import image
-import numpy as np
-import cv2
 import os
-from flask import Flask, request
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+import sys
 import time
-from flask_midtrans import Midtrans
+import tempfile
+import threading
+import metrics
+from metrics import startup_timer, startup_timings
+_app_start = time.perf_counter()
+
+# Stack ML (numpy, OpenCV, TensorFlow/Keras) tidak diimpor di sini, lihat load_ml()
+with startup_timer("flask"):
+    from flask import Flask, request, jsonify, send_from_directory, render_template, g, has_request_context, Response, stream_with_context
+    from flask_cors import CORS  # Tambahkan ini
+    from werkzeug.security import generate_password_hash, check_password_hash
+    from werkzeug.utils import secure_filename
+with startup_timer("sqlalchemy"):
+    from flask_sqlalchemy import SQLAlchemy
+    from sqlalchemy import event, and_, or_, func
+    from sqlalchemy.exc import IntegrityError
+    from sqlalchemy.orm import Session
+with startup_timer("midtrans"):
+    from flask_midtrans import Midtrans
+with startup_timer("mail"):
+    from itsdangerous import URLSafeTimedSerializer
+    from flask_mail import Mail, Message
 from dotenv import load_dotenv
-from datetime import datetime
-from itsdangerous import URLSafeTimedSerializer
-from flask_mail import Mail, Message
+from datetime import datetime, timedelta
+import base64
+import csv
+import hashlib
+import io
+import json
+from result_cache import ResultCache
+from jobs import JobQueue
 #import mysqlclient
 load_dotenv()
 
@@ -30,6 +47,32 @@ app.config['MIDTRANS_CLIENT_KEY'] = os.getenv('MIDTRANS_CLIENT_KEY')
 app.config['MIDTRANS_SERVER_KEY'] = os.getenv('MIDTRANS_SERVER_KEY')
 app.config['MIDTRANS_IS_PRODUCTION'] = os.getenv('MIDTRANS_IS_PRODUCTION') == 'True'
 
+app.config['MAX_BATCH_FILES'] = int(os.getenv('MAX_BATCH_FILES') or '32')
+# Batas ukuran per file gambar, dicek sebelum decode
+app.config['MAX_UPLOAD_BYTES'] = int(float(os.getenv('MAX_UPLOAD_MB') or '10') * 1024 * 1024)
+app.config['MAX_VIDEO_BYTES'] = int(float(os.getenv('MAX_VIDEO_MB') or '100') * 1024 * 1024)
+app.config['MAX_VIDEO_SECONDS'] = int(os.getenv('MAX_VIDEO_SECONDS') or '300')
+app.config['MAX_CONTENT_LENGTH'] = max(app.config['MAX_UPLOAD_BYTES'] * app.config['MAX_BATCH_FILES'], app.config['MAX_VIDEO_BYTES'])
+
+# Folder tempat /model/reload boleh mengambil file model
+app.config['EMOTION_MODEL_DIR'] = os.getenv('EMOTION_MODEL_DIR') or '.'
+MODEL_EXTENSIONS = ('.keras', '.h5', '.tflite')
+
+# Cache hasil /predict berdasarkan hash isi file
+app.config['RESULT_CACHE_ENABLED'] = (os.getenv('EMOTION_CACHE') or 'True') == 'True'
+app.config['RESULT_CACHE_PHASH'] = os.getenv('EMOTION_CACHE_PHASH') == 'True'
+
+# Slot jam reservasi yang ditampilkan di grid /availability
+app.config['RESERVATION_TIME_SLOTS'] = [slot.strip() for slot in (
+    os.getenv('RESERVATION_TIME_SLOTS') or '10:00,11:00,12:00,13:00,14:00,15:00,16:00,17:00,18:00,19:00,20:00,21:00'
+).split(',') if slot.strip()]
+app.config['MAX_AVAILABILITY_DAYS'] = int(os.getenv('MAX_AVAILABILITY_DAYS') or '31')
+# Jumlah baris per fetch dari database dan per potongan response saat export
+app.config['EXPORT_CHUNK_SIZE'] = int(os.getenv('EXPORT_CHUNK_SIZE') or '1000')
+# Katalog /getAllTables: umur cache di server dan Cache-Control untuk client
+app.config['TABLES_CACHE_TTL'] = int(os.getenv('TABLES_CACHE_TTL') or '300')
+app.config['TABLES_MAX_AGE'] = int(os.getenv('TABLES_MAX_AGE') or '60')
+
 app.config['MAIL_SERVER'] = 'smtp.gmail.com'
 app.config['MAIL_PORT'] = 587
 app.config['MAIL_USE_TLS'] = True
@@ -61,6 +104,12 @@ class Reservation(db.Model):
     table_id = db.Column(db.Integer, db.ForeignKey('table.id'), nullable=False)
     user = db.relationship('User', backref=db.backref('reservations', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_reservation_user_date', 'user_id', 'date'),
+        # Satu meja hanya bisa dipesan sekali per tanggal dan jam
+        db.Index('uq_reservation_date_time_table', 'date', 'time', 'table_id', unique=True),
+    )
+
 class Transaction(db.Model):
     transaction_id = db.Column(db.String(100), primary_key=True, unique=True, nullable=False)
     reservation_id = db.Column(db.String(100), db.ForeignKey('reservation.id'), nullable=False)
@@ -77,10 +126,21 @@ class Review(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     rating = db.Column(db.Integer, nullable=False)
     comment = db.Column(db.String(500), nullable=True)
-    date= db.Column(db.DateTime, nullable=False, default=datetime.now)
+    date= db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
 
     user = db.relationship('User', backref=db.backref('reviews', lazy=True))
 
+class ReviewSummary(db.Model):
+    # Satu baris ringkasan rating, diperbarui setiap ada review baru
+    id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+
 
 class Table(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -94,7 +154,7 @@ class Refund(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     reservation_id = db.Column(db.String(100), nullable=False)
     transaction_id = db.Column(db.String(100), unique=True, nullable=False)
-    transaction_time = db.Column(db.DateTime, nullable=False)
+    transaction_time = db.Column(db.DateTime, nullable=False, index=True)
     transaction_status = db.Column(db.String(50), nullable=False)
     payment_type = db.Column(db.String(50), nullable=False)
     order_id = db.Column(db.String(100), unique=True, nullable=False)
@@ -111,6 +171,12 @@ class Notification(db.Model):
 
     user = db.relationship('User', backref=db.backref('notifications', lazy=True))
 
+    __table_args__ = (
+        # Daftar notifikasi per user (terbaru dulu) dan hitungan unread
+        db.Index('ix_notification_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_notification_user_status_timestamp', 'user_id', 'status', 'timestamp'),
+    )
+
 def seed_tables():
     if Table.query.count() > 0:
         print("Data sudah ada di tabel, tidak menambahkan data baru.")
@@ -141,105 +207,275 @@ def seed_tables():
     print("10 tables have been added to the database.")
 
 
-with app.app_context():
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+
+def ensure_indexes():
+    """
+    create_all tidak menambahkan index baru ke tabel yang sudah ada.
+    Dijalankan sebagai langkah migrasi (flask ensure-indexes), bukan di setiap
+    cold start, karena memeriksa setiap index butuh round trip ke database.
+    """
+    for table in db.Model.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(db.engine, checkfirst=True)
+            except Exception as e:
+                if not index.unique:
+                    print(f"Index error ({index.name}): {e}")
+                    continue
+                # Tanpa unique index proteksinya (mis. pemesanan ganda) tidak aktif,
+                # jadi aplikasi tidak boleh jalan diam-diam
+                raise RuntimeError(
+                    f"Unique index {index.name} could not be created: {e}. "
+                    f"Duplicate rows in {table.name}: {duplicate_rows(index)}. "
+                    f"Resolve them and restart."
+                ) from e
+
+def duplicate_rows(index, limit=10):
+    """
+    Contoh nilai kolom yang muncul lebih dari sekali, untuk pesan error unique index
+    """
+    columns = list(index.columns)
+    try:
+        rows = db.session.query(*columns, func.count()).group_by(*columns) \
+            .having(func.count() > 1).limit(limit).all()
+    except Exception as e:
+        db.session.rollback()
+        return f"unknown ({e})"
+    return [tuple(row) for row in rows]
+
+with app.app_context(), startup_timer("database"):
+    event.listen(db.engine, "before_cursor_execute", count_query)
     db.create_all()
     try:
         seed_tables()
     except Exception as e:
         print(f"Seeder error: {e}")
 
-
-CORS(app)
-
-def load_emotion_model(model_path):
+@app.cli.command("ensure-indexes")
+def ensure_indexes_command():
     """
-    Memuat model yang telah dilatih
-    """
-    return load_model(model_path)
-
-def get_emotion_prediction(model, image):
+    Menambahkan index baru ke database yang sudah ada (jalankan saat deploy)
     """
-    Memprediksi emosi dari gambar
-    """
-    class_labels = ['Angry', 'Happy', 'Neutral', 'Sad', 'Surprise']
-
-    # Preprocess gambar
-    preprocessed_image = preprocess_image(image)
-
-    # Set steps_per_execution to 1 before prediction
-    model.steps_per_execution = 1
+    ensure_indexes()
+    print("Indexes are up to date.")
 
-    # Prediksi
-    predictions = model.predict(preprocessed_image)
+# X-Next-Cursor (halaman berikutnya /reservations) harus bisa dibaca dari browser
+CORS(app, expose_headers=['X-Next-Cursor'])
 
-    # Ambil indeks dengan probabilitas tertinggi
-    predicted_class = np.argmax(predictions[0])
+_ml_lock = threading.Lock()
 
-    # Ambil label emosi dan probabilitasnya
-    emotion = class_labels[predicted_class]
-    probability = predictions[0][predicted_class]
-
-    return emotion, probability
-
-def preprocess_image(image):
+def load_ml():
     """
-    Memproses gambar untuk prediksi
+    Mengimpor stack ML saat pertama dibutuhkan (route prediksi atau preload),
+    supaya route lain seperti /login dan /reservations tidak menunggu import TensorFlow
     """
-    # Pastikan gambar dalam mode grayscale
-    if len(image.shape) == 3 and image.shape[2] == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-
-    # Resize ke ukuran 48x48
-    resized = cv2.resize(gray, (48, 48))
-    
-    # Normalisasi
-    normalized = resized / 255.0
-    
-    # Reshape untuk model
-    preprocessed = normalized.reshape((1, 48, 48, 1))
-    return preprocessed
+    if 'emotion' in sys.modules:
+        return
+    with _ml_lock:
+        if 'emotion' in sys.modules:
+            return
+        with startup_timer("numpy"):
+            import numpy
+        with startup_timer("opencv"):
+            import cv2
+        with startup_timer("tensorflow"):
+            import tensorflow
+        # Keras hanya untuk backend keras; backend tflite cukup dengan TensorFlow Lite
+        if (os.getenv('EMOTION_BACKEND') or 'keras') == 'keras':
+            with startup_timer("keras"):
+                import keras
+        with startup_timer("emotion"):
+            import video
+            import emotion
+        print(f"ML stack loaded: {startup_report()['subsystems_ms']}")
+
+def startup_report():
+    report = {"subsystems_ms": {name: round(ms, 1) for name, ms in startup_timings.items()}}
+    if 'emotion' in sys.modules:
+        from emotion import model_registry
+        info = model_registry.info()
+        if info["loaded"]:
+            report["subsystems_ms"]["model_load"] = round(info["load_seconds"] * 1000.0, 1)
+            report["subsystems_ms"]["model_warmup"] = round(info["warmup_seconds"] * 1000.0, 1)
+    report["ml_loaded"] = 'emotion' in sys.modules
+    return report
+
+# Muat stack ML dan model saat startup jika diminta, selain itu dimuat saat /predict pertama
+if os.getenv('EMOTION_MODEL_PRELOAD') == 'True':
+    load_ml()
+    from emotion import model_registry
+    model_registry.get()
 
 # instance
 midtrans = Midtrans(app)
+result_cache = ResultCache(
+    max_entries=int(os.getenv('EMOTION_CACHE_MAX_ENTRIES') or '1024'),
+    ttl_seconds=int(os.getenv('EMOTION_CACHE_TTL') or '600'),
+    max_bytes=int(float(os.getenv('EMOTION_CACHE_MAX_MB') or '16') * 1024 * 1024)
+)
+job_queue = JobQueue(
+    workers=int(os.getenv('JOB_WORKERS') or '2'),
+    ttl_seconds=int(os.getenv('JOB_TTL') or '3600'),
+    max_queued=int(os.getenv('JOB_QUEUE_MAX') or '100'),
+    max_queued_bytes=int(float(os.getenv('JOB_QUEUE_MAX_MB') or '512') * 1024 * 1024)
+)
+
+# Katalog meja jarang berubah, jadi disimpan di memori (sudah dalam bentuk
+# JSON + ETag) dan dibuang setiap ada commit yang mengubah Table. TTL menjaga
+# proses lain yang tidak melihat commit tersebut tetap ikut diperbarui.
+_tables_lock = threading.Lock()
+_tables_cache = {"catalog": None, "generation": 0}
+
+def cached_catalog():
+    with _tables_lock:
+        catalog = _tables_cache["catalog"]
+        if catalog is not None and catalog["expires_at"] > time.monotonic():
+            return catalog
+        generation = _tables_cache["generation"]
 
-def facecrop(image_path):
-    try:
-        cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + "haarcascade_frontalface_alt.xml"
-        )
-        img = cv2.imread(image_path)
-        if img is None:
-            print("Error: Failed to load image")
-            return None
-            
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        faces = cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-        )
-        
-        if len(faces) == 0:
-            print("No faces detected")
-            return None
-            
-        for (x, y, w, h) in faces:
-            face = img[y:y+h, x:x+w]
-            face_path = "cropped_face.jpg"
-            cv2.imwrite(face_path, face)
-            return face_path
-            
-        return None
-    except Exception as e:
-        print(f"Error in facecrop: {str(e)}")
-        return None
+    tables = [
+        {
+            'id': table.id,
+            'table_number': table.table_number,
+            'capacity': table.capacity,
+            'location': table.location
+        }
+        for table in Table.query.order_by(Table.id).all()
+    ]
+    body = json.dumps({'tables': tables}, sort_keys=True)
+    catalog = {
+        "tables": tables,
+        "body": body,
+        "etag": hashlib.sha1(body.encode()).hexdigest(),
+        "expires_at": time.monotonic() + app.config['TABLES_CACHE_TTL'],
+    }
+    with _tables_lock:
+        # Jangan simpan hasil yang sudah basi karena ada commit saat query berjalan
+        if _tables_cache["generation"] == generation:
+            _tables_cache["catalog"] = catalog
+    return catalog
+
+def cached_tables():
+    return cached_catalog()["tables"]
+
+def invalidate_tables_cache():
+    with _tables_lock:
+        _tables_cache["catalog"] = None
+        _tables_cache["generation"] += 1
+
+def track_table_changes(session, flush_context, instances):
+    if any(isinstance(obj, Table) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['tables_changed'] = True
+
+def invalidate_tables_on_commit(session):
+    if session.info.pop('tables_changed', False):
+        invalidate_tables_cache()
+
+def discard_table_changes(session):
+    session.info.pop('tables_changed', None)
+
+event.listen(Session, "before_flush", track_table_changes)
+event.listen(Session, "after_commit", invalidate_tables_on_commit)
+event.listen(Session, "after_rollback", discard_table_changes)
+
+def emotion_metrics():
+    values = []
+
+    cache = result_cache.stats()
+    for key in ("entries", "bytes", "hits", "misses", "evictions", "expirations", "invalidations"):
+        values.append((f"emotion_cache_{key}", f"Result cache {key}", cache[key]))
+
+    jobs = job_queue.stats()
+    values.append(("emotion_jobs_queue_depth", "Async jobs waiting for a worker", jobs["queue_depth"]))
+    values.append(("emotion_jobs_queued_bytes", "Spooled payload bytes of unfinished jobs", jobs["queued_bytes"]))
+    for status in ("queued", "running", "done", "failed"):
+        values.append((f"emotion_jobs_{status}", f"Async jobs {status}", jobs["jobs"].get(status, 0)))
+
+    # Jangan memicu import TensorFlow hanya karena /metrics di-scrape
+    if 'emotion' not in sys.modules:
+        values.append(("emotion_model_loaded", "1 if the emotion model is loaded", 0))
+        return values
+
+    from emotion import model_registry
+    from face_detector import face_detector
+    info = model_registry.info()
+    values.append(("emotion_model_loaded", "1 if the emotion model is loaded", int(info["loaded"])))
+    values.append(("emotion_model_load_seconds", "Time spent loading the emotion model", info["load_seconds"]))
+    if info["batching"]:
+        for key in ("queue_depth", "requests", "batches", "average_batch_size", "largest_batch"):
+            values.append((f"emotion_batch_{key}", f"Micro-batcher {key}", info["batching"][key]))
+    if info["workers"]:
+        values.append(("emotion_workers_alive", "Inference workers alive", sum(w["alive"] for w in info["workers"])))
+        values.append(("emotion_workers_restarts", "Inference worker restarts", sum(w["restarts"] for w in info["workers"])))
+
+    detector = face_detector.info()
+    values.append(("emotion_detector_average_ms", "Average face detection latency", detector["average_ms"]))
+    return values
+
+metrics.gauges.register(emotion_metrics)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.requests_total.inc(request.method, route, response.status_code)
+        metrics.request_seconds.observe(time.perf_counter() - start, request.method, route)
+        metrics.db_queries.observe(g.get('db_queries', 0), route)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/")
 def home():
     return "Selamat datang di API deteksi emosi!"
 
+def read_upload(file):
+    """
+    Membaca isi file upload, None jika melebihi MAX_UPLOAD_BYTES
+    """
+    data = file.read(app.config['MAX_UPLOAD_BYTES'] + 1)
+    if len(data) > app.config['MAX_UPLOAD_BYTES']:
+        return None
+    return data
+
+def spool_upload(file, max_bytes, suffix=""):
+    """
+    Menyalin upload ke file sementara per potongan 1 MB, supaya video dan payload
+    job tidak disimpan di memori. Mengembalikan path, None jika melebihi max_bytes
+    """
+    size = 0
+    with tempfile.NamedTemporaryFile(prefix="emotion-upload-", suffix=suffix, delete=False) as tmp:
+        while True:
+            chunk = file.stream.read(1024 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                break
+            tmp.write(chunk)
+
+    if size > max_bytes:
+        os.remove(tmp.name)
+        return None
+    return tmp.name
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": "Ukuran request terlalu besar"}), 413
+
 @app.route("/predict", methods=["POST"])
 def predict_emotion():
+    load_ml()
     try:
         print("Request received")  # Debug log
         
@@ -252,53 +488,357 @@ def predict_emotion():
             print("No filename")  # Debug log
             return jsonify({"error": "Nama file kosong"}), 400
 
-        # Simpan file dengan nama unik berdasarkan timestamp
-        import time
-        timestamp = int(time.time())
-        file_path = f"uploaded_image_{timestamp}.jpg"
-        
-        print(f"Saving file to {file_path}")  # Debug log
-        file.save(file_path)
-        
-        # Crop wajah menggunakan fungsi asli
-        cropped_face_path = facecrop(file_path)
-        
-        if cropped_face_path is None:
-            print("No faces detected")  # Debug log
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            return jsonify({"error": "Tidak ada wajah terdeteksi pada gambar"}), 400
-        
-        # Muat model
-        model = load_emotion_model("best_emotion_model_v2.keras")  # Sesuaikan path model jika berbeda
-        
-        # Baca gambar yang dicrop
-        cropped_img = cv2.imread(cropped_face_path)
-        
-        # Prediksi emosi
-        emotion, probability = get_emotion_prediction(model, cropped_img)
-        
-        # Cleanup
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        if os.path.exists(cropped_face_path):
-            os.remove(cropped_face_path)
+        data = read_upload(file)
+        if data is None:
+            return jsonify({"error": "Ukuran file terlalu besar"}), 413
 
-        print(f"Prediction complete: {emotion} ({probability:.2f})")  # Debug log
-        return jsonify({
-            "max_emotion": emotion,
-            "max_percentage": round(float(probability) * 100, 1)
-        })
+        all_faces = request.args.get("all_faces") == "true"
+        max_faces = parse_max_faces(all_faces)
+        if max_faces is None:
+            return jsonify({"error": "max_faces harus berupa angka minimal 1"}), 400
+
+        result, error, status = predict_image_data(data, all_faces, max_faces)
+        if error:
+            return jsonify({"error": error}), status
+        return jsonify(result)
 
     except Exception as e:
         print(f"Error in predict_emotion: {str(e)}")  # Debug log
-        # Cleanup in case of error
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
-        if 'cropped_face_path' in locals() and os.path.exists(cropped_face_path):
-            os.remove(cropped_face_path)
         return jsonify({"error": f"Terjadi kesalahan: {str(e)}"}), 500
 
+def parse_max_faces(all_faces):
+    """
+    max_faces hanya dipakai (dan divalidasi) pada mode all_faces
+    """
+    from emotion import MAX_FACES
+    if not all_faces:
+        return MAX_FACES
+    try:
+        max_faces = int(request.args.get("max_faces", MAX_FACES))
+    except ValueError:
+        return None
+    # 0 atau negatif akan memotong daftar wajah secara diam-diam ([:-1])
+    if max_faces < 1:
+        return None
+    return min(max_faces, MAX_FACES)
+
+def predict_image_data(data, all_faces, max_faces):
+    """
+    Prediksi emosi dari bytes gambar, dipakai /predict dan job async.
+    Mengembalikan (hasil, pesan error, status HTTP).
+    """
+    from emotion import model_registry, decode_reduced
+    from result_cache import content_hash
+
+    # Ambil backend yang sudah dimuat (dimuat sekali per proses)
+    backend, version = model_registry.snapshot()
+
+    # Gambar yang sama persis tidak perlu diproses ulang
+    cache_key = f"{'all:%d' % max_faces if all_faces else 'single'}:{content_hash(data)}"
+    if app.config['RESULT_CACHE_ENABLED']:
+        cached = result_cache.get(cache_key, version)
+        if cached is not None:
+            print("Prediction served from cache")  # Debug log
+            return cached, None, 200
+
+    # Decode langsung dari stream request (grayscale, diperkecil untuk deteksi)
+    img = decode_reduced(data)
+    if img is None:
+        print("Failed to decode image")  # Debug log
+        return None, "Gagal membaca gambar", 400
+
+    # Mode multi-face: semua wajah diklasifikasi dalam satu forward pass
+    if all_faces:
+        result = predict_all_faces(backend, img, max_faces)
+    else:
+        result = predict_single_face(backend, img, version)
+
+    if result is None:
+        print("No faces detected")  # Debug log
+        return None, "Tidak ada wajah terdeteksi pada gambar", 400
+
+    if app.config['RESULT_CACHE_ENABLED']:
+        result_cache.put(cache_key, result, version)
+    return result, None, 200
+
+def predict_single_face(backend, img, version):
+    from emotion import crop_face, get_emotion_prediction
+    from result_cache import perceptual_hash
+    # Crop wajah (view dari array gambar)
+    face = crop_face(img)
+    if face is None:
+        return None
+
+    # Wajah yang sama dengan encoding berbeda dikenali lewat perceptual hash
+    face_key = None
+    if app.config['RESULT_CACHE_ENABLED'] and app.config['RESULT_CACHE_PHASH']:
+        face_key = f"face:{perceptual_hash(face)}"
+        cached = result_cache.get(face_key, version)
+        if cached is not None:
+            return cached
+
+    # Prediksi emosi
+    emotion, probability = get_emotion_prediction(backend, face)
+
+    print(f"Prediction complete: {emotion} ({probability:.2f})")  # Debug log
+    result = {
+        "max_emotion": emotion,
+        "max_percentage": round(float(probability) * 100, 1)
+    }
+    if face_key is not None:
+        result_cache.put(face_key, result, version)
+    return result
+
+def predict_all_faces(backend, img, max_faces):
+    from emotion import crop_faces, predict_batch
+    faces = crop_faces(img, max_faces)
+    if not faces:
+        return None
+
+    predictions = predict_batch(backend, [crop for _, crop in faces])
+
+    results = []
+    for (x, y, w, h), (emotion, probability) in zip((box for box, _ in faces), predictions):
+        results.append({
+            "box": {"x": x, "y": y, "w": w, "h": h},
+            "emotion": emotion,
+            "percentage": round(float(probability) * 100, 1)
+        })
+
+    # Tetap sertakan hasil wajah terbesar agar kompatibel dengan klien lama
+    print(f"Prediction complete: {len(results)} faces")  # Debug log
+    return {
+        "max_emotion": results[0]["emotion"],
+        "max_percentage": results[0]["percentage"],
+        "faces": results
+    }
+
+@app.route("/predict/batch", methods=["POST"])
+def predict_emotion_batch():
+    load_ml()
+    from emotion import model_registry, decode_reduced, crop_face, predict_batch
+    try:
+        files = request.files.getlist("files") or request.files.getlist("file")
+        if not files:
+            return jsonify({"error": "Tidak ada file gambar yang diunggah"}), 400
+        if len(files) > app.config['MAX_BATCH_FILES']:
+            return jsonify({"error": f"Maksimal {app.config['MAX_BATCH_FILES']} file per request"}), 400
+
+        # Decode dan crop semua gambar di memori
+        results = []
+        faces = []
+        face_indexes = []
+        for file in files:
+            data = read_upload(file)
+            if data is None:
+                results.append({"filename": file.filename, "error": "Ukuran file terlalu besar"})
+                continue
+
+            img = decode_reduced(data)
+            if img is None:
+                results.append({"filename": file.filename, "error": "Gagal membaca gambar"})
+                continue
+
+            face = crop_face(img)
+            if face is None:
+                results.append({"filename": file.filename, "error": "Tidak ada wajah terdeteksi pada gambar"})
+                continue
+
+            face_indexes.append(len(results))
+            faces.append(face)
+            results.append({"filename": file.filename})
+
+        # Satu forward pass untuk semua wajah
+        if faces:
+            predictions = predict_batch(model_registry.get(), faces)
+            for index, (emotion, probability) in zip(face_indexes, predictions):
+                results[index]["max_emotion"] = emotion
+                results[index]["max_percentage"] = round(float(probability) * 100, 1)
+
+        print(f"Batch prediction complete: {len(faces)}/{len(files)} faces")  # Debug log
+        return jsonify({"results": results}), 200
+
+    except Exception as e:
+        print(f"Error in predict_emotion_batch: {str(e)}")  # Debug log
+        return jsonify({"error": f"Terjadi kesalahan: {str(e)}"}), 500
+
+@app.route("/model", methods=["GET"])
+def model_info():
+    # Hanya laporan status: jangan memicu import TensorFlow
+    if 'emotion' not in sys.modules:
+        return jsonify({"loaded": False, "message": "ML stack not loaded yet"}), 200
+    from emotion import model_registry
+    return jsonify(model_registry.info()), 200
+
+@app.route("/startup", methods=["GET"])
+def startup_info():
+    return jsonify(startup_report()), 200
+
+@app.route("/predict/video", methods=["POST"])
+def predict_emotion_video():
+    load_ml()
+    try:
+        if "file" not in request.files:
+            return jsonify({"error": "Tidak ada file video yang diunggah"}), 400
+
+        file = request.files["file"]
+        if file.filename == '':
+            return jsonify({"error": "Nama file kosong"}), 400
+
+        params = parse_video_params()
+        if params is None:
+            return jsonify({"error": "Parameter tidak valid"}), 400
+
+        # OpenCV membaca video dari path: upload langsung disalin ke file sementara
+        suffix = os.path.splitext(secure_filename(file.filename))[1] or ".mp4"
+        video_path = spool_upload(file, app.config['MAX_VIDEO_BYTES'], suffix)
+        if video_path is None:
+            return jsonify({"error": "Ukuran file terlalu besar"}), 413
+
+        try:
+            result, error, status = analyze_video_file(video_path, params)
+        finally:
+            os.remove(video_path)
+        if error:
+            return jsonify({"error": error}), status
+        return jsonify(result), 200
+
+    except Exception as e:
+        print(f"Error in predict_emotion_video: {str(e)}")  # Debug log
+        return jsonify({"error": f"Terjadi kesalahan: {str(e)}"}), 500
+
+def parse_video_params():
+    from emotion import MAX_FACES
+    try:
+        params = {
+            "sample_fps": float(request.args.get("sample_fps", 2)),
+            "keyframe_interval": int(request.args.get("keyframe_interval", 5)),
+            "smoothing": float(request.args.get("smoothing", 0)),
+            "max_faces": min(int(request.args.get("max_faces", MAX_FACES)), MAX_FACES),
+        }
+    except ValueError:
+        return None
+    if (params["sample_fps"] <= 0 or params["keyframe_interval"] < 1 or not 0 <= params["smoothing"] < 1
+            or params["max_faces"] < 1):
+        return None
+    return params
+
+def analyze_video_file(video_path, params):
+    """
+    Analisis video dari file, dipakai /predict/video dan job async.
+    Mengembalikan (hasil, pesan error, status HTTP).
+    """
+    from emotion import model_registry
+    from video import analyze_video
+
+    result = analyze_video(
+        video_path, model_registry.get, max_seconds=app.config['MAX_VIDEO_SECONDS'], **params
+    )
+    if result is None:
+        return None, "Gagal membaca video", 400
+
+    print(f"Video analysis complete: {len(result['faces'])} faces, {result['frames_sampled']} frames")  # Debug log
+    return result, None, 200
+
+def predict_image_file(path, all_faces, max_faces):
+    with open(path, "rb") as f:
+        return predict_image_data(f.read(), all_faces, max_faces)
+
+def run_job(fn, *args):
+    result, error, _ = fn(*args)
+    if error:
+        raise ValueError(error)
+    return result
+
+@app.route("/jobs/predict", methods=["POST"])
+def submit_prediction_job():
+    load_ml()
+    try:
+        if "file" not in request.files:
+            return jsonify({"error": "Tidak ada file yang diunggah"}), 400
+
+        file = request.files["file"]
+        if file.filename == '':
+            return jsonify({"error": "Nama file kosong"}), 400
+
+        if request.args.get("type") == "video":
+            params = parse_video_params()
+            if params is None:
+                return jsonify({"error": "Parameter tidak valid"}), 400
+            # Upload disimpan ke file spool, job membacanya dari disk
+            suffix = os.path.splitext(secure_filename(file.filename))[1] or ".mp4"
+            spool_path = spool_upload(file, app.config['MAX_VIDEO_BYTES'], suffix)
+            if spool_path is None:
+                return jsonify({"error": "Ukuran file terlalu besar"}), 413
+            job_id = job_queue.submit(run_job, analyze_video_file, spool_path, params, spool_path=spool_path)
+        else:
+            all_faces = request.args.get("all_faces") == "true"
+            max_faces = parse_max_faces(all_faces)
+            if max_faces is None:
+                return jsonify({"error": "max_faces harus berupa angka minimal 1"}), 400
+            spool_path = spool_upload(file, app.config['MAX_UPLOAD_BYTES'])
+            if spool_path is None:
+                return jsonify({"error": "Ukuran file terlalu besar"}), 413
+            job_id = job_queue.submit(run_job, predict_image_file, spool_path, all_faces, max_faces, spool_path=spool_path)
+
+        if job_id is None:
+            os.remove(spool_path)
+            return jsonify({"error": "Antrean job penuh, coba lagi nanti"}), 503
+
+        return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202
+
+    except Exception as e:
+        print(f"Error in submit_prediction_job: {str(e)}")  # Debug log
+        return jsonify({"error": f"Terjadi kesalahan: {str(e)}"}), 500
+
+@app.route("/jobs/<string:job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+@app.route("/cache", methods=["GET"])
+def cache_info():
+    return jsonify(result_cache.stats()), 200
+
+@app.route("/detector", methods=["GET"])
+def detector_info():
+    if 'face_detector' not in sys.modules:
+        return jsonify({"loaded": False, "message": "Face detector not loaded yet"}), 200
+    from face_detector import face_detector
+    return jsonify(face_detector.info()), 200
+
+@app.route("/model/reload", methods=["POST"])
+def reload_model():
+    # Reload memuat dan warmup ulang model, jadi hanya untuk admin (?user_id=)
+    error = require_admin()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    model_path = data.get("model_path")
+    backend = data.get("backend")
+    if model_path:
+        # Hanya nama file model di EMOTION_MODEL_DIR, bukan path sembarang
+        if os.path.basename(model_path) != model_path or os.path.splitext(model_path)[1] not in MODEL_EXTENSIONS:
+            return jsonify({"error": f"model_path harus nama file {', '.join(MODEL_EXTENSIONS)} di folder model"}), 400
+        model_path = os.path.join(app.config['EMOTION_MODEL_DIR'], model_path)
+        if not os.path.isfile(model_path):
+            return jsonify({"error": "Model file not found"}), 404
+
+    load_ml()
+    from emotion import model_registry, BACKENDS
+    try:
+        if backend and backend not in BACKENDS:
+            return jsonify({"error": f"Unknown backend, choose one of: {', '.join(BACKENDS)}"}), 400
+
+        info = model_registry.reload(model_path, backend)
+        return jsonify({"message": "Model reloaded successfully", "model": info}), 200
+    except Exception as e:
+        print(f"Error reloading model: {str(e)}")
+        return jsonify({"error": "Model could not be loaded"}), 500
+
 @app.route("/signup", methods=["GET", "POST"])
 def signup():
     # Ambil data dari request
@@ -463,42 +1003,42 @@ def create_reservation():
         table_id = request.json.get('table_id')
         transaction_id = request.json.get('transaction_id')
 
-        if not user_id or not date or not time:
-            return jsonify({"error": "User ID, date, and time are required"}), 400
-
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        if not user_id or not date or not time or not table_id:
+            return jsonify({"error": "User ID, date, time, and table ID are required"}), 400
 
+        # Tidak ada cek terpisah: unique index (date, time, table_id) yang
+        # menolak pemesanan ganda, reservasi dan notifikasi di-commit bersama
         new_reservation = Reservation(id=id, user_id=user_id, date=date, time=time, name = name, phone=phone, email=email, guest_count=guest_count, table_id=table_id, transaction_id=transaction_id)
         new_notification = Notification(user_id=user_id, message=f"Reservation telah berhasil di tanggal {date} dan jam {time}. Reservasi ID: {id}")
         db.session.add(new_reservation)
         db.session.add(new_notification)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # Query tambahan hanya di jalur gagal, untuk membedakan penyebabnya
+            if Reservation.query.filter_by(date=date, time=time, table_id=table_id).first():
+                return jsonify({"error": "Sorry, this table is already reserved at this time and date."}), 409
+            return jsonify({"error": "Reservation could not be saved: unknown user or table, or duplicate reservation ID"}), 400
 
         return jsonify({"message": "Reservation created successfully!"}), 201
     except Exception as e:
+        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 @app.route('/getAllTables', methods=['GET'])
 def get_all_tables():
-    tables = Table.query.all()
+    # Jika cache masih ada, If-None-Match dijawab 304 tanpa query ke database
+    catalog = cached_catalog()
 
-    if not tables:
+    if not catalog["tables"]:
         return jsonify({'message': 'No tables found'}), 404
 
-    tables_data = []
-    for table in tables:
-        table_data = {
-            'id': table.id,
-            'table_number': table.table_number,
-            'capacity': table.capacity,
-            'location': table.location
-        }
-        tables_data.append(table_data)
+    response = Response(catalog["body"], mimetype='application/json')
+    response.set_etag(catalog["etag"])
+    response.headers['Cache-Control'] = f"public, max-age={app.config['TABLES_MAX_AGE']}"
+    return response.make_conditional(request)
 
-    return jsonify({'tables': tables_data}), 200
-    
 @app.route("/reservations", methods=["GET"])
 def get_reservations():
     try:
@@ -510,17 +1050,50 @@ def get_reservations():
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        if user.role == 'admin':
-            # Sort descending by date or id
-            reservations = Reservation.query.order_by(Reservation.date.desc()).all()
-        else:
-            reservations = Reservation.query.filter_by(user_id=user_id).order_by(Reservation.date.desc()).all()
+        limit = parse_limit(default=100, maximum=500)
+        if limit is None:
+            return jsonify({"error": "limit harus berupa angka"}), 400
+
+        # Username dan nomor meja diambil dalam query yang sama
+        query = db.session.query(Reservation, User.username, Table.table_number) \
+            .join(User, User.id == Reservation.user_id) \
+            .join(Table, Table.id == Reservation.table_id)
+
+        if user.role != 'admin':
+            query = query.filter(Reservation.user_id == user.id)
+
+        # Filter opsional
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        table_id = request.args.get('table_id')
+        if date_from:
+            query = query.filter(Reservation.date >= date_from)
+        if date_to:
+            query = query.filter(Reservation.date <= date_to)
+        if table_id:
+            query = query.filter(Reservation.table_id == table_id)
+
+        # Keyset pagination: terbaru dulu, lanjut dari (date, id) terakhir
+        cursor = request.args.get('cursor')
+        if cursor:
+            values = decode_cursor(cursor)
+            if not isinstance(values, list) or len(values) != 2 or not all(isinstance(value, str) for value in values):
+                return jsonify({"error": "Invalid cursor"}), 400
+            last_date, last_id = values
+            query = query.filter(or_(
+                Reservation.date < last_date,
+                and_(Reservation.date == last_date, Reservation.id < last_id)
+            ))
+
+        rows = query.order_by(Reservation.date.desc(), Reservation.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
 
         reservations_data = [
             {   
                 "id": r.id,
                 "user_id": r.user_id,
-                "username": r.user.username,
+                "username": username,
                 "date": r.date,
                 "time": r.time,
                 "name": r.name,
@@ -528,15 +1101,112 @@ def get_reservations():
                 "email": r.email,
                 "guest_count": r.guest_count,
                 "table_id": r.table_id,
-                "table_number": r.table.table_number,
+                "table_number": table_number,
             }
-            for r in reservations
+            for r, username, table_number in rows
         ]
-        return jsonify(reservations_data), 200
+
+        # Body tetap berupa list; cursor halaman berikutnya dikirim lewat header
+        response = jsonify(reservations_data)
+        if has_more:
+            response.headers['X-Next-Cursor'] = encode_cursor(rows[-1][0].date, rows[-1][0].id)
+        return response, 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def parse_limit(default=20, maximum=100):
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        return None
+    return min(max(limit, 1), maximum)
+
+def encode_cursor(*values):
+    """
+    Cursor keyset pagination: nilai kolom urutan terakhir + id, di-encode base64
+    """
+    raw = json.dumps(values, default=lambda value: value.isoformat())
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        return None
+
+def decode_timestamp_cursor(cursor):
+    """
+    Cursor (timestamp ISO, id integer) -> (datetime, id), None jika tidak valid
+    """
+    values = decode_cursor(cursor)
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    timestamp, last_id = values
+    if not isinstance(timestamp, str) or not isinstance(last_id, int) or isinstance(last_id, bool):
+        return None
+    try:
+        return datetime.fromisoformat(timestamp), last_id
+    except ValueError:
+        return None
+
+def update_review_summary(rating):
+    """
+    Menambah satu rating ke ringkasan dalam transaksi yang sama dengan review-nya
+    """
+    if increment_review_summary(rating):
+        return
+
+    # Ringkasan belum ada: dibuat dari tabel review (termasuk review ini) di
+    # dalam savepoint. Jika request lain membuatnya lebih dulu, cukup ulangi UPDATE.
+    db.session.flush()
+    try:
+        with db.session.begin_nested():
+            rebuild_review_summary()
+    except IntegrityError:
+        increment_review_summary(rating)
+
+def increment_review_summary(rating):
+    return ReviewSummary.query.filter_by(id=1).update({
+        ReviewSummary.count: ReviewSummary.count + 1,
+        ReviewSummary.rating_sum: ReviewSummary.rating_sum + rating,
+        getattr(ReviewSummary, f"rating_{rating}"): getattr(ReviewSummary, f"rating_{rating}") + 1,
+    }, synchronize_session=False)
+
+def rebuild_review_summary():
+    """
+    Menghitung ulang ringkasan dari tabel review (hanya saat ringkasan belum ada)
+    """
+    summary = ReviewSummary.query.get(1) or ReviewSummary(id=1)
+    summary.count = summary.rating_sum = 0
+    for rating in range(1, 6):
+        setattr(summary, f"rating_{rating}", 0)
+
+    rows = db.session.query(Review.rating, func.count(Review.id)).group_by(Review.rating).all()
+    for rating, count in rows:
+        if 1 <= rating <= 5:
+            setattr(summary, f"rating_{rating}", count)
+            summary.count += count
+            summary.rating_sum += rating * count
+    db.session.add(summary)
+    return summary
+
+def review_stats():
+    summary = ReviewSummary.query.get(1)
+    if summary is None:
+        try:
+            summary = rebuild_review_summary()
+            db.session.commit()
+        except IntegrityError:
+            # Dibuat bersamaan oleh request lain
+            db.session.rollback()
+            summary = ReviewSummary.query.get(1)
+    return {
+        "count": summary.count,
+        "average": round(summary.rating_sum / summary.count, 2) if summary.count else None,
+        "distribution": {str(rating): getattr(summary, f"rating_{rating}") for rating in range(1, 6)},
+    }
+
 @app.route("/review", methods=["POST"])
 def create_review():
     try:
@@ -549,13 +1219,14 @@ def create_review():
         if not user_id or not rating:
             return jsonify({"error": "User ID dan rating diperlukan"}), 400
 
-        # Validasi rating
-        if rating < 1 or rating > 5:
-            return jsonify({"error": "Rating harus antara 1 hingga 5"}), 400
+        # Validasi rating (bilangan bulat, dipakai juga sebagai kolom rating_N di ringkasan)
+        if not isinstance(rating, int) or isinstance(rating, bool) or rating < 1 or rating > 5:
+            return jsonify({"error": "Rating harus bilangan bulat antara 1 hingga 5"}), 400
 
         # Simpan review ke dalam database
         new_review = Review(user_id=user_id, rating=rating, comment=comment, date=date)
         db.session.add(new_review)
+        update_review_summary(rating)
         db.session.commit()
 
         return jsonify({"message": "Review berhasil ditambahkan!"}), 201
@@ -566,25 +1237,47 @@ def create_review():
 @app.route("/reviews", methods=["GET"])
 def get_reviews():
     try:
-        reviews = Review.query.all()  # Fetch all reviews from the database
-        if not reviews:
+        limit = parse_limit()
+        if limit is None:
+            return jsonify({"error": "limit harus berupa angka"}), 400
+
+        # Review dan user-nya diambil dalam satu query join
+        query = db.session.query(Review, User.username, User.email).join(User, User.id == Review.user_id)
+
+        # Keyset pagination: review terbaru dulu, lanjut dari (date, id) terakhir
+        cursor = request.args.get('cursor')
+        if cursor:
+            position = decode_timestamp_cursor(cursor)
+            if position is None:
+                return jsonify({"error": "Invalid cursor"}), 400
+            last_date, last_id = position
+            query = query.filter(or_(
+                Review.date < last_date,
+                and_(Review.date == last_date, Review.id < last_id)
+            ))
+
+        rows = query.order_by(Review.date.desc(), Review.id.desc()).limit(limit + 1).all()
+        if not rows and not cursor:
             return jsonify({"message": "No reviews found"}), 404
 
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
         result = []
-        for review in reviews:
-            user = User.query.get(review.user_id)
+        for review, username, email in rows:
             review_data = {
                 "id": review.id,
                 "user_id": review.user_id,
                 "rating": review.rating,
                 "comment": review.comment,
-                "username": user.username,  # Include the username of the reviewer
-                "email": user.email,  # You can also include the email if needed
+                "username": username,  # Include the username of the reviewer
+                "email": email,  # You can also include the email if needed
                 "date": review.date
             }
             result.append(review_data)
 
-        return jsonify({"reviews": result}), 200
+        next_cursor = encode_cursor(rows[-1][0].date, rows[-1][0].id) if has_more else None
+        return jsonify({"reviews": result, "next_cursor": next_cursor, "stats": review_stats()}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -678,6 +1371,67 @@ def check_reservation():
     else:
         return jsonify({'message': 'Table is available for reservation.'}), 200
 
+def parse_date_range():
+    """
+    ?date=YYYY-MM-DD atau ?date_from=...&date_to=... -> (list tanggal, error)
+    """
+    date = request.args.get('date')
+    date_from = request.args.get('date_from', date)
+    date_to = request.args.get('date_to', date_from)
+    if not date_from:
+        return None, "date atau date_from diperlukan"
+
+    try:
+        start = datetime.strptime(date_from, '%Y-%m-%d')
+        end = datetime.strptime(date_to, '%Y-%m-%d')
+    except ValueError:
+        return None, "Format tanggal harus YYYY-MM-DD"
+
+    days = (end - start).days + 1
+    if days < 1:
+        return None, "date_to harus setelah date_from"
+    if days > app.config['MAX_AVAILABILITY_DAYS']:
+        return None, f"Maksimal {app.config['MAX_AVAILABILITY_DAYS']} hari per request"
+    return [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)], None
+
+@app.route('/availability', methods=['GET'])
+def get_availability():
+    """
+    Grid ketersediaan meja x slot jam untuk satu tanggal atau rentang tanggal,
+    pengganti /check_reservation per meja per slot
+    """
+    dates, error = parse_date_range()
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        tables = cached_tables()
+
+        # Satu query yang cukup dibaca dari index (date, time, table_id)
+        booked = db.session.query(Reservation.date, Reservation.time, Reservation.table_id) \
+            .filter(Reservation.date.in_(dates)).all()
+
+        slots = list(app.config['RESERVATION_TIME_SLOTS'])
+        # Reservasi di luar slot standar tetap ditampilkan
+        slots.extend(sorted({slot for _, slot, _ in booked} - set(slots)))
+
+        availability = {
+            date: {str(table['id']): {slot: True for slot in slots} for table in tables}
+            for date in dates
+        }
+        for date, slot, table_id in booked:
+            row = availability[date].get(str(table_id))
+            if row is not None:
+                row[slot] = False
+
+        data = {"dates": dates, "time_slots": slots, "tables": tables, "availability": availability}
+        response = jsonify(data)
+        # Grid yang tidak berubah dijawab 304 tanpa body
+        response.set_etag(hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest())
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/reservations/<string:reservation_id>', methods=['DELETE'])
 def delete_reservation(reservation_id):
     try:
@@ -746,6 +1500,142 @@ def get_all_refunds():
         return jsonify({"error": str(e)}), 500
 
 
+EXPORT_FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+def require_admin():
+    """
+    Mengembalikan response error jika user_id bukan admin, None jika boleh lanjut
+    """
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({"error": "User ID is required"}), 400
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    if user.role != 'admin':
+        return jsonify({"error": "Admin only"}), 403
+    return None
+
+def parse_export_dates():
+    """
+    ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD (keduanya opsional, inklusif)
+    """
+    dates = []
+    for name in ('date_from', 'date_to'):
+        value = request.args.get(name)
+        if value:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                return None, None, "Format tanggal harus YYYY-MM-DD"
+        dates.append(value)
+    return dates[0], dates[1], None
+
+def stream_export(query, fields, to_row, fmt, filename):
+    """
+    Mengirim hasil query sebagai JSONL/CSV per potongan. Baris diambil dari
+    database dengan yield_per (server-side cursor jika driver mendukung),
+    jadi memori tetap konstan berapa pun jumlah barisnya.
+    """
+    chunk_size = app.config['EXPORT_CHUNK_SIZE']
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields) if fmt == 'csv' else None
+        if writer:
+            writer.writeheader()
+
+        count = 0
+        for item in query.yield_per(chunk_size):
+            row = to_row(item)
+            if writer:
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row, default=lambda value: value.isoformat()) + "\n")
+            count += 1
+            if count % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+    # Tanpa Content-Length, response dikirim dengan chunked transfer encoding
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{fmt}'
+    return response
+
+def parse_export_request():
+    """
+    Validasi bersama untuk endpoint export -> (format, date_from, date_to, error response)
+    """
+    error = require_admin()
+    if error:
+        return None, None, None, error
+
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in EXPORT_FORMATS:
+        return None, None, None, (jsonify({"error": "format harus jsonl atau csv"}), 400)
+
+    date_from, date_to, message = parse_export_dates()
+    if message:
+        return None, None, None, (jsonify({"error": message}), 400)
+    return fmt, date_from, date_to, None
+
+@app.route('/refunds/export', methods=['GET'])
+def export_refunds():
+    try:
+        fmt, date_from, date_to, error = parse_export_request()
+        if error:
+            return error
+
+        query = Refund.query
+        if date_from:
+            query = query.filter(Refund.transaction_time >= datetime.strptime(date_from, '%Y-%m-%d'))
+        if date_to:
+            query = query.filter(Refund.transaction_time < datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1))
+        query = query.order_by(Refund.transaction_time.desc(), Refund.id.desc())
+
+        fields = ['id', 'user_id', 'reservation_id', 'transaction_id', 'transaction_time',
+                  'transaction_status', 'payment_type', 'order_id', 'status']
+        return stream_export(query, fields, lambda refund: {field: getattr(refund, field) for field in fields},
+                             fmt, 'refunds')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/reservations/export', methods=['GET'])
+def export_reservations():
+    try:
+        fmt, date_from, date_to, error = parse_export_request()
+        if error:
+            return error
+
+        query = db.session.query(Reservation, User.username, Table.table_number) \
+            .join(User, User.id == Reservation.user_id) \
+            .join(Table, Table.id == Reservation.table_id)
+        if date_from:
+            query = query.filter(Reservation.date >= date_from)
+        if date_to:
+            query = query.filter(Reservation.date <= date_to)
+        query = query.order_by(Reservation.date.desc(), Reservation.id.desc())
+
+        fields = ['id', 'user_id', 'username', 'date', 'time', 'name', 'phone', 'email',
+                  'guest_count', 'table_id', 'table_number', 'transaction_id']
+
+        def to_row(item):
+            r, username, table_number = item
+            row = {field: getattr(r, field) for field in fields if field not in ('username', 'table_number')}
+            row['username'] = username
+            row['table_number'] = table_number
+            return row
+
+        return stream_export(query, fields, to_row, fmt, 'reservations')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/refunds/<int:id>', methods=['GET', 'PUT'])
 def manage_refund(id):
     refund = Refund.query.get(id)
@@ -783,11 +1673,48 @@ def manage_refund(id):
 @app.route('/notifications/<int:id>', methods=['GET'])
 def get_notification_by_id(id):
     try:
-        # Mengurutkan data notifikasi secara descending berdasarkan timestamp
-        notifications = Notification.query.filter_by(user_id=id).order_by(Notification.timestamp.desc()).all()
-
-        if not notifications:
-            return jsonify({'error': 'Notifications not found'}), 404
+        limit = parse_limit(default=50, maximum=200)
+        if limit is None:
+            return jsonify({"error": "limit harus berupa angka"}), 400
+
+        query = Notification.query.filter_by(user_id=id)
+        status = request.args.get('status')
+        if status:
+            query = query.filter_by(status=status)
+
+        # cursor: halaman berikutnya (lebih lama), since: hanya yang lebih baru (polling)
+        cursor = request.args.get('cursor')
+        since = request.args.get('since')
+        if cursor and since:
+            return jsonify({"error": "Gunakan cursor atau since, tidak keduanya"}), 400
+        if cursor or since:
+            position = decode_timestamp_cursor(cursor or since)
+            if position is None:
+                return jsonify({"error": "Invalid cursor"}), 400
+            last_timestamp, last_id = position
+
+        if since:
+            query = query.filter(or_(
+                Notification.timestamp > last_timestamp,
+                and_(Notification.timestamp == last_timestamp, Notification.id > last_id)
+            ))
+            # Ambil yang paling dekat dengan since dulu, lalu balik supaya tetap terbaru dulu
+            rows = query.order_by(Notification.timestamp.asc(), Notification.id.asc()).limit(limit + 1).all()
+            has_more = len(rows) > limit
+            notifications = rows[:limit][::-1]
+        else:
+            if cursor:
+                query = query.filter(or_(
+                    Notification.timestamp < last_timestamp,
+                    and_(Notification.timestamp == last_timestamp, Notification.id < last_id)
+                ))
+            # Mengurutkan data notifikasi secara descending berdasarkan timestamp
+            rows = query.order_by(Notification.timestamp.desc(), Notification.id.desc()).limit(limit + 1).all()
+            has_more = len(rows) > limit
+            notifications = rows[:limit]
+
+            if not notifications and not cursor:
+                return jsonify({'error': 'Notifications not found'}), 404
 
         notification_data = []
         for notification in notifications:
@@ -800,8 +1727,67 @@ def get_notification_by_id(id):
             }
             notification_data.append(notificationTemp)
 
-        return jsonify({'notif': notification_data}), 200
+        # since: masih ada notifikasi baru lagi jika has_more, panggil ulang dengan latest_cursor
+        next_cursor = None
+        if has_more and not since:
+            next_cursor = encode_cursor(notifications[-1].timestamp, notifications[-1].id)
+        if notifications and (since or not cursor):
+            latest_cursor = encode_cursor(notifications[0].timestamp, notifications[0].id)
+        else:
+            latest_cursor = since
+
+        return jsonify({
+            'notif': notification_data,
+            'next_cursor': next_cursor,
+            'latest_cursor': latest_cursor,
+            'has_more': has_more,
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/notifications/<int:id>/unread_count', methods=['GET'])
+def get_unread_count(id):
+    try:
+        # Cukup dihitung dari index (user_id, status, timestamp)
+        count = db.session.query(func.count(Notification.id)) \
+            .filter(Notification.user_id == id, Notification.status == 'unread').scalar()
+        return jsonify({'user_id': id, 'unread_count': count}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/notifications/<int:id>/read', methods=['POST'])
+def mark_notifications_read(id):
+    """
+    Menandai notifikasi user sebagai 'read' dengan satu UPDATE.
+    Body opsional: {"ids": [...]} untuk notifikasi tertentu saja,
+    atau {"until": cursor} untuk semua sampai notifikasi tersebut.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        query = Notification.query.filter(Notification.user_id == id, Notification.status == 'unread')
+
+        ids = data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+                return jsonify({'error': 'ids harus berupa list angka'}), 400
+            query = query.filter(Notification.id.in_(ids))
+
+        until = data.get('until')
+        if until:
+            position = decode_timestamp_cursor(until)
+            if position is None:
+                return jsonify({"error": "Invalid cursor"}), 400
+            last_timestamp, last_id = position
+            query = query.filter(or_(
+                Notification.timestamp < last_timestamp,
+                and_(Notification.timestamp == last_timestamp, Notification.id <= last_id)
+            ))
+
+        updated = query.update({Notification.status: 'read'}, synchronize_session=False)
+        db.session.commit()
+        return jsonify({'message': 'Notifications marked as read', 'updated': updated}), 200
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 # Forgot Password Endpoint
@@ -871,7 +1857,8 @@ def reset_password(token):
 
 
 
-
+startup_timings["app_total"] = (time.perf_counter() - _app_start) * 1000.0
+print(f"Startup: {startup_report()['subsystems_ms']}")
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
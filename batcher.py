@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Menggabungkan tensor dari request yang datang bersamaan menjadi satu batch.
+    Dipakai sebagai pembungkus backend: predict() memasukkan tensor ke antrean,
+    thread scheduler mengumpulkan antrean selama max_wait_ms atau sampai
+    max_batch_size baris, menjalankan satu kali inferensi, lalu membagikan
+    hasilnya ke masing-masing pemanggil.
+    """
+
+    def __init__(self, backend, max_batch_size=32, max_wait_ms=5):
+        self.backend = backend
+        self.name = backend.name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Statistik
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.batch_sizes = {}
+
+        self._thread = threading.Thread(target=self._run, name="emotion-microbatcher", daemon=True)
+        self._thread.start()
+
+    def predict(self, batch):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                # Batcher lama setelah reload model, langsung ke backend
+                return self.backend.predict(batch)
+            self._queue.put((batch, future))
+        return future.result()
+
+    def close(self):
+        """
+        Menghentikan scheduler setelah semua antrean yang ada selesai diproses
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            pending = [item]
+            size = len(item[0])
+            stop = False
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            self._run_batch(pending)
+            if stop:
+                return
+
+    def _run_batch(self, pending):
+        try:
+            batch = np.concatenate([tensor for tensor, _ in pending]).astype(np.float32, copy=False)
+            predictions = self.backend.predict(batch)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for tensor, future in pending:
+            future.set_result(predictions[offset:offset + len(tensor)])
+            offset += len(tensor)
+
+        with self._lock:
+            self.requests += len(pending)
+            self.batches += 1
+            self.rows += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "requests": self.requests,
+                "batches": self.batches,
+                "rows": self.rows,
+                "average_batch_size": self.rows / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            }
@@ -0,0 +1,272 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from emotion import (DEFAULT_MODEL_PATH, KerasBackend, decode_reduced, detect_faces, crop_face,
+                     preprocess_image, preprocess_images, get_emotion_prediction)
+
+STAGES = ("decode", "detect", "preprocess", "infer", "end_to_end", "legacy_io", "fast_path")
+
+
+def time_calls(fn, repeat):
+    """
+    Runs fn() `repeat` times and returns the per-call latencies in milliseconds
+    """
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def summarize(latencies, images_per_call=1):
+    latencies = np.asarray(latencies)
+    mean = float(latencies.mean())
+    return {
+        "calls": len(latencies),
+        "mean_ms": mean,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "images_per_sec": images_per_call * 1000.0 / mean if mean else 0.0,
+    }
+
+
+def build_stand_in_model(path):
+    """
+    Saves a tiny untrained model with the same input/output shape as the real one
+    """
+    import keras
+
+    model = keras.Sequential([
+        keras.Input((48, 48, 1)),
+        keras.layers.Conv2D(8, 3, activation="relu"),
+        keras.layers.MaxPooling2D(),
+        keras.layers.Conv2D(16, 3, activation="relu"),
+        keras.layers.GlobalAveragePooling2D(),
+        keras.layers.Dense(5, activation="softmax"),
+    ])
+    model.save(path)
+    return path
+
+
+def load_fixtures(fixture_dir, sizes):
+    """
+    Encodes each fixture image (plus one synthetic image) as JPEG at every
+    target long-side size. Returns {size: [jpeg bytes, ...]}.
+    """
+    images = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*"))):
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is not None:
+            images.append(img)
+
+    # Synthetic image: noise with a bright ellipse so detection has something to scan
+    synthetic = np.random.default_rng(0).integers(0, 255, (720, 960, 3), dtype=np.uint8)
+    cv2.ellipse(synthetic, (480, 360), (120, 160), 0, 0, 360, (200, 200, 200), -1)
+    images.append(synthetic)
+
+    fixtures = {}
+    for size in sizes:
+        encoded = []
+        for img in images:
+            scale = size / max(img.shape[:2])
+            resized = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+            ok, buffer = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            if ok:
+                encoded.append(buffer.tobytes())
+        fixtures[size] = encoded
+    return fixtures
+
+
+def face_or_center(img):
+    """
+    Face crop for timing later stages; falls back to a center crop when the
+    fixture has no detectable face
+    """
+    face = crop_face(img)
+    if face is not None:
+        return face
+    gray = img.image
+    h, w = gray.shape[:2]
+    side = min(h, w) // 2
+    return gray[(h - side) // 2:(h + side) // 2, (w - side) // 2:(w + side) // 2]
+
+
+def cycle(items):
+    state = {"index": 0}
+
+    def next_item():
+        item = items[state["index"] % len(items)]
+        state["index"] += 1
+        return item
+    return next_item
+
+
+def bench_image_stages(backend, fixtures, stages, repeat):
+    results = {}
+    for size, encoded in fixtures.items():
+        decoded = [decode_reduced(data) for data in encoded]
+        faces = [face_or_center(img) for img in decoded]
+        size_results = {"faces_found": sum(crop_face(img) is not None for img in decoded), "images": len(encoded)}
+
+        if "decode" in stages:
+            next_data = cycle(encoded)
+            size_results["decode"] = summarize(time_calls(lambda: decode_reduced(next_data()), repeat))
+        if "detect" in stages:
+            next_img = cycle(decoded)
+            size_results["detect"] = summarize(time_calls(lambda: detect_faces(next_img()), repeat))
+        if "preprocess" in stages:
+            next_face = cycle(faces)
+            size_results["preprocess"] = summarize(time_calls(lambda: preprocess_image(next_face()), repeat))
+        if "end_to_end" in stages:
+            next_data = cycle(encoded)
+            size_results["end_to_end"] = summarize(time_calls(
+                lambda: get_emotion_prediction(backend, face_or_center(decode_reduced(next_data()))), repeat
+            ))
+        if "legacy_io" in stages:
+            next_data = cycle(encoded)
+            size_results["legacy_io"] = summarize(time_calls(lambda: legacy_io(next_data()), repeat))
+        results[str(size)] = size_results
+    return results
+
+
+def legacy_io(data):
+    """
+    The disk round trips the old /predict did around detection: save upload,
+    imread it, imwrite the crop and imread it back
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        upload_path = os.path.join(tmp, "upload.jpg")
+        face_path = os.path.join(tmp, "cropped_face.jpg")
+        with open(upload_path, "wb") as f:
+            f.write(data)
+        img = cv2.imread(upload_path)
+        cv2.imwrite(face_path, img[:img.shape[0] // 2, :img.shape[1] // 2])
+        cv2.imread(face_path)
+
+
+def bench_batches(backend, fixtures, stages, repeat, batch_sizes):
+    encoded = next(iter(fixtures.values()))
+    faces = [face_or_center(decode_reduced(data)) for data in encoded]
+
+    results = {}
+    for batch_size in batch_sizes:
+        crops = [faces[i % len(faces)] for i in range(batch_size)]
+        batch = preprocess_images(crops)
+        batch_results = {}
+
+        if "preprocess" in stages:
+            batch_results["preprocess"] = summarize(time_calls(lambda: preprocess_images(crops), repeat), batch_size)
+        if "infer" in stages:
+            backend.predict(batch)
+            batch_results["infer"] = summarize(time_calls(lambda: backend.predict(batch), repeat), batch_size)
+        if "fast_path" in stages and isinstance(backend, KerasBackend):
+            model = backend.model
+            model.steps_per_execution = 1
+            model.predict(batch, verbose=0)
+            predict = summarize(time_calls(lambda: model.predict(batch, verbose=0), repeat), batch_size)
+            fast_path = summarize(time_calls(lambda: backend.predict(batch), repeat), batch_size)
+            batch_results["fast_path"] = {
+                "model_predict": predict,
+                "fast_path": fast_path,
+                "speedup_p50": predict["p50_ms"] / fast_path["p50_ms"],
+            }
+        results[str(batch_size)] = batch_results
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """
+    Lists every p50 in `current` that is more than `tolerance` slower than in `baseline`
+    """
+    regressions = []
+
+    def walk(cur, base, path):
+        if not isinstance(cur, dict) or not isinstance(base, dict):
+            return
+        if "p50_ms" in cur and "p50_ms" in base:
+            if base["p50_ms"] > 0 and cur["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+                regressions.append({
+                    "stage": "/".join(path),
+                    "baseline_p50_ms": base["p50_ms"],
+                    "current_p50_ms": cur["p50_ms"],
+                    "change": cur["p50_ms"] / base["p50_ms"] - 1,
+                })
+            return
+        for key, value in cur.items():
+            walk(value, base.get(key), path + [key])
+
+    walk(current.get("results"), baseline.get("results"), [])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the emotion prediction pipeline")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH,
+                        help="Keras model; a tiny stand-in model is generated when the file is missing")
+    parser.add_argument("--fixtures", default="uploads", help="Folder with sample images")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma separated subset of {', '.join(STAGES)}")
+    parser.add_argument("--sizes", default="640,1280,2560,4000", help="Image long-side sizes in pixels")
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed p50 slowdown versus the baseline")
+    args = parser.parse_args()
+
+    stages = set(args.stages.split(","))
+    unknown = stages - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    sizes = [int(size) for size in args.sizes.split(",")]
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model
+        stand_in = not os.path.exists(model_path)
+        if stand_in:
+            model_path = build_stand_in_model(os.path.join(tmp, "stand_in.keras"))
+
+        backend = KerasBackend(model_path)
+        fixtures = load_fixtures(args.fixtures, sizes)
+
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                        "processor": platform.processor(), "cpus": os.cpu_count()},
+            "model": {"path": args.model, "stand_in": stand_in},
+            "repeat": args.repeat,
+            "results": {
+                "image_sizes": bench_image_stages(backend, fixtures, stages, args.repeat),
+                "batch_sizes": bench_batches(backend, fixtures, stages, args.repeat, batch_sizes),
+            },
+        }
+
+    if args.compare:
+        with open(args.compare) as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if report.get("regressions"):
+        print(f"{len(report['regressions'])} stage(s) regressed more than {args.tolerance:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
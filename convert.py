@@ -1,14 +1,201 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
 import tensorflow as tf
-from keras.models import load_model
 import numpy as np
+from emotion import (class_labels, KerasBackend, TFLiteBackend, compare_backends, decode_reduced,
+                     crop_face, preprocess_images)
+
+VARIANTS = ("float32", "float16", "dynamic", "int8")
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp", "*.webp")
+
+
+def variant_path(output_dir, variant):
+    # float32 keeps the original file name used by the TFLite backend
+    name = "emotion_model.tflite" if variant == "float32" else f"emotion_model_{variant}.tflite"
+    return os.path.join(output_dir, name)
+
+
+def find_images(folder):
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(folder, "**", pattern), recursive=True))
+    return sorted(paths)
+
+
+def load_faces(paths):
+    """
+    Decodes each image, crops the face (or keeps the whole image when no face
+    is found). Returns the preprocessed (N, 48, 48, 1) batch and the indexes
+    of the paths that could be decoded.
+    """
+    crops, kept = [], []
+    for i, path in enumerate(paths):
+        with open(path, "rb") as f:
+            img = decode_reduced(f.read())
+        if img is None:
+            continue
+        face = crop_face(img)
+        crops.append(face if face is not None else img.image)
+        kept.append(i)
+    return preprocess_images(crops), kept
+
+
+def load_eval_set(folder):
+    """
+    Held-out images. When they sit in sub folders named after class_labels
+    (e.g. eval/Happy/*.jpg) the labels are used to compute accuracy.
+    """
+    paths, labels = [], []
+    for path in find_images(folder):
+        label = os.path.basename(os.path.dirname(path))
+        paths.append(path)
+        labels.append(class_labels.index(label) if label in class_labels else -1)
+    batch, kept = load_faces(paths)
+    return batch, np.asarray(labels)[kept]
+
+
+def representative_dataset(batch):
+    def generator():
+        for sample in batch:
+            yield [sample[np.newaxis].astype(np.float32)]
+    return generator
+
+
+def convert(model, variant, calibration):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif variant == "int8":
+        # Full-integer weights and activations; input/output stay float32 so
+        # the TFLite backend can use the model without changes
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(calibration)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+def latency_ms(backend, batch, repeat):
+    sample = batch[:1]
+    backend.predict(sample)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backend.predict(sample)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return {"p50": float(np.percentile(latencies, 50)), "p95": float(np.percentile(latencies, 95))}
+
+
+def evaluate(name, backend, batch, labels, reference, repeat, size_bytes):
+    probs = backend.predict(batch)
+    predicted = np.argmax(probs, axis=1)
+    reference_predicted = np.argmax(reference, axis=1)
+
+    report = {
+        "variant": name,
+        "size_bytes": size_bytes,
+        "latency_ms": latency_ms(backend, batch, repeat),
+        "agreement": float(np.mean(predicted == reference_predicted)),
+        "max_prob_diff": float(np.max(np.abs(probs - reference))),
+        "mean_prob_diff": float(np.mean(np.abs(probs - reference))),
+        # Share of images the Keras model puts in each class that keep the same label
+        "agreement_per_class": {
+            label: float(np.mean(predicted[reference_predicted == i] == i)) if np.any(reference_predicted == i) else None
+            for i, label in enumerate(class_labels)
+        },
+    }
+    known = labels >= 0
+    if np.any(known):
+        report["accuracy"] = float(np.mean(predicted[known] == labels[known]))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the emotion model to TFLite variants and compare them")
+    parser.add_argument("--model", default="model.keras")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help=f"Comma separated subset of {', '.join(VARIANTS)}")
+    parser.add_argument("--representative-dir", help="Images used to calibrate the int8 variant")
+    parser.add_argument("--eval-dir", help="Held-out images, optionally in sub folders named after class labels")
+    parser.add_argument("--threads", type=int, default=1, help="TFLite interpreter threads for the latency check")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--report", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    variants = args.variants.split(",")
+    unknown = set(variants) - set(VARIANTS)
+    if unknown:
+        parser.error(f"Unknown variants: {', '.join(sorted(unknown))}")
+
+    # Load the Keras model (once, shared with the reference backend)
+    keras_backend = KerasBackend(args.model)
+    model = keras_backend.model
+
+    rng = np.random.default_rng(0)
+    if args.eval_dir:
+        eval_batch, eval_labels = load_eval_set(args.eval_dir)
+    else:
+        print("No --eval-dir given, comparing variants on random inputs (no accuracy)")
+        eval_batch = rng.random((64, 48, 48, 1), dtype=np.float32)
+        eval_labels = np.full(len(eval_batch), -1)
+
+    calibration = None
+    if "int8" in variants:
+        if args.representative_dir:
+            calibration, _ = load_faces(find_images(args.representative_dir)[:500])
+        else:
+            print("No --representative-dir given, calibrating int8 on the evaluation images")
+            calibration = eval_batch
+
+    reference = keras_backend.predict(eval_batch)
+    keras_size = os.path.getsize(args.model)
+    reports = [evaluate("keras", keras_backend, eval_batch, eval_labels, reference, args.repeat, keras_size)]
+
+    drift_error = None
+    os.makedirs(args.output_dir, exist_ok=True)
+    for variant in variants:
+        # Convert the model to TensorFlow Lite
+        tflite_model = convert(model, variant, calibration)
+
+        # Save the TensorFlow Lite model
+        path = variant_path(args.output_dir, variant)
+        with open(path, 'wb') as f:
+            f.write(tflite_model)
+
+        backend = TFLiteBackend(path, num_threads=args.threads)
+        report = evaluate(variant, backend, eval_batch, eval_labels, reference, args.repeat, len(tflite_model))
+        report["path"] = path
+        reports.append(report)
+
+        # The float32 export must match Keras within the backend tolerance;
+        # checked here, reported after the table and report are written
+        if variant == "float32":
+            try:
+                compare_backends(keras_backend, backend, eval_batch, tolerance=1e-3)
+            except AssertionError as e:
+                drift_error = str(e)
+                report["error"] = drift_error
+
+    print(f"{'variant':<10}{'size KB':>10}{'p50 ms':>9}{'agree':>8}{'max diff':>10}{'accuracy':>10}")
+    for report in reports:
+        accuracy = f"{report['accuracy']:.3f}" if "accuracy" in report else "-"
+        print(f"{report['variant']:<10}{report['size_bytes'] / 1024:>10.1f}{report['latency_ms']['p50']:>9.3f}"
+              f"{report['agreement']:>8.3f}{report['max_prob_diff']:>10.4f}{accuracy:>10}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"model": args.model, "eval_images": len(eval_batch), "variants": reports}, f, indent=2)
 
-# Load the Keras model
-model = load_model("model.keras")
+    if drift_error:
+        sys.exit(f"float32 export does not match the Keras model: {drift_error}")
 
-# Convert the model to TensorFlow Lite
-converter = tf.lite.TFLiteConverter.from_keras_model(model)
-tflite_model = converter.convert()
 
-# Save the TensorFlow Lite model
-with open('emotion_model.tflite', 'wb') as f:
-    f.write(tflite_model)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+import numpy as np
+import cv2
+import os
+import time
+import hashlib
+import threading
+import io
+from PIL import Image
+from batcher import MicroBatcher
+from workers import InferencePool
+from face_detector import face_detector
+from metrics import stage_timer
+from dotenv import load_dotenv
+load_dotenv()
+
+class_labels = ['Angry', 'Happy', 'Neutral', 'Sad', 'Surprise']
+
+# Backend inferensi: 'keras' (default) atau 'tflite' (hasil convert.py)
+DEFAULT_BACKEND = os.getenv('EMOTION_BACKEND') or 'keras'
+DEFAULT_MODEL_PATHS = {
+    'keras': 'best_emotion_model_v2.keras',
+    'tflite': 'emotion_model.tflite',
+}
+DEFAULT_MODEL_PATH = os.getenv('EMOTION_MODEL_PATH') or DEFAULT_MODEL_PATHS.get(DEFAULT_BACKEND)
+TFLITE_NUM_THREADS = int(os.getenv('EMOTION_TFLITE_THREADS') or '1')
+# Ukuran batch yang dikompilasi untuk fast path Keras; batch dipad ke bucket terdekat
+BATCH_BUCKETS = tuple(int(size) for size in (os.getenv('EMOTION_BATCH_BUCKETS') or '1,2,4,8,16,32,64').split(','))
+
+# Batas jumlah wajah yang diklasifikasi per gambar pada mode multi-face
+MAX_FACES = int(os.getenv('EMOTION_MAX_FACES') or '10')
+
+# Jumlah proses worker inferensi (0 = inferensi di proses web)
+INFERENCE_WORKERS = int(os.getenv('EMOTION_WORKERS') or '0')
+
+# Deteksi dijalankan pada gambar yang sudah diperkecil saat decode
+DETECTION_MAX_SIDE = int(os.getenv('EMOTION_DETECTION_MAX_SIDE') or '640')
+# Wajah yang lebih kecil dari ini di gambar tereduksi di-crop dari resolusi penuh
+CROP_MIN_SIZE = 48
+MAX_IMAGE_PIXELS = int(os.getenv('EMOTION_MAX_IMAGE_PIXELS') or str(50 * 1000 * 1000))
+
+REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Micro-batching untuk request /predict yang datang bersamaan
+BATCHING_ENABLED = os.getenv('EMOTION_BATCHING') == 'True'
+BATCH_MAX_SIZE = int(os.getenv('EMOTION_BATCH_MAX_SIZE') or '32')
+BATCH_MAX_WAIT_MS = float(os.getenv('EMOTION_BATCH_MAX_WAIT_MS') or '5')
+
+
+def load_emotion_model(model_path):
+    """
+    Memuat model yang telah dilatih
+    """
+    from keras.models import load_model
+
+    return load_model(model_path)
+
+
+def model_version(model_path):
+    """
+    Versi model = nama file + 12 karakter pertama sha1 isi file
+    """
+    sha1 = hashlib.sha1()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(chunk)
+    return f"{os.path.basename(model_path)}@{sha1.hexdigest()[:12]}"
+
+
+class KerasBackend:
+    """
+    Inferensi dengan model Keras penuh.
+    Tidak memakai model.predict (yang membuat data adapter dan menjalankan
+    callback setiap panggilan), tapi fungsi tf.function dengan input
+    signature tetap yang dikompilasi sekali per bucket ukuran batch.
+    """
+    name = 'keras'
+
+    def __init__(self, model_path, buckets=BATCH_BUCKETS):
+        self.model = load_emotion_model(model_path)
+        self.buckets = tuple(sorted(buckets))
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    def _function(self, bucket):
+        function = self._functions.get(bucket)
+        if function is None:
+            with self._lock:
+                function = self._functions.get(bucket)
+                if function is None:
+                    import tensorflow as tf
+
+                    model = self.model
+                    function = tf.function(
+                        lambda x: model(x, training=False),
+                        input_signature=[tf.TensorSpec((bucket, 48, 48, 1), tf.float32)]
+                    ).get_concrete_function()
+                    self._functions[bucket] = function
+        return function
+
+    def predict(self, batch):
+        """
+        batch: array (N, 48, 48, 1), hasil: probabilitas (N, 5)
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        largest = self.buckets[-1]
+        if len(batch) > largest:
+            return np.concatenate([
+                self.predict(batch[start:start + largest])
+                for start in range(0, len(batch), largest)
+            ])
+
+        rows = len(batch)
+        bucket = next(size for size in self.buckets if size >= rows)
+        if bucket != rows:
+            padded = np.zeros((bucket, 48, 48, 1), dtype=np.float32)
+            padded[:rows] = batch
+            batch = padded
+        return self._function(bucket)(batch).numpy()[:rows]
+
+
+class TFLiteBackend:
+    """
+    Inferensi dengan TFLite interpreter (lebih ringan untuk host CPU)
+    """
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None):
+        import tensorflow as tf
+
+        self.num_threads = num_threads or TFLITE_NUM_THREADS
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=self.num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = int(self.interpreter.get_input_details()[0]['shape'][0])
+        # Interpreter tidak thread-safe
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self.batch_size:
+                self.interpreter.resize_tensor_input(self.input_index, list(batch.shape))
+                self.interpreter.allocate_tensors()
+                self.batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self.input_index, batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+BACKENDS = {
+    'keras': KerasBackend,
+    'tflite': TFLiteBackend,
+}
+
+
+def create_backend(name, model_path):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name}")
+    return BACKENDS[name](model_path)
+
+
+def compare_backends(backend_a, backend_b, batch, tolerance=1e-3):
+    """
+    Memastikan dua backend memberi label yang sama dan probabilitas yang
+    selisihnya tidak lebih dari tolerance. Mengembalikan selisih terbesar.
+    """
+    probs_a = backend_a.predict(batch)
+    probs_b = backend_b.predict(batch)
+
+    labels_a = np.argmax(probs_a, axis=1)
+    labels_b = np.argmax(probs_b, axis=1)
+    if not np.array_equal(labels_a, labels_b):
+        raise AssertionError(f"Label berbeda: {backend_a.name}={labels_a.tolist()} {backend_b.name}={labels_b.tolist()}")
+
+    max_diff = float(np.max(np.abs(probs_a - probs_b)))
+    if max_diff > tolerance:
+        raise AssertionError(f"Selisih probabilitas {max_diff:.6f} melebihi toleransi {tolerance}")
+    return max_diff
+
+
+class ModelRegistry:
+    """
+    Menyimpan model emosi yang sudah dimuat agar tidak di-load ulang setiap request.
+    Model dimuat sekali (saat startup atau saat pertama dipakai), di-warmup,
+    dan bisa di-reload dengan file baru tanpa restart.
+    """
+
+    def __init__(self, model_path, backend=DEFAULT_BACKEND, batching=BATCHING_ENABLED, workers=INFERENCE_WORKERS):
+        self.model_path = model_path
+        self.backend_name = backend
+        self.batching = batching
+        self.workers = workers
+        self.backend = None
+        self.version = None
+        # (backend, version) ditukar dalam satu assignment, lihat snapshot()
+        self._snapshot = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        return self.snapshot()[0]
+
+    def snapshot(self):
+        """
+        Mengembalikan (backend, version) dari model yang sama. Dipakai bila
+        hasil prediksi disimpan per versi model, supaya reload di antara dua
+        pembacaan tidak mencampur hasil model lama dengan versi baru.
+        """
+        # Fast path tanpa lock setelah model siap
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._load(self.model_path, self.backend_name)
+            return self._snapshot
+
+    def reload(self, model_path=None, backend=None):
+        """
+        Memuat model baru lalu menukarnya setelah warmup selesai.
+        Request yang sedang berjalan tetap memakai model lama.
+        """
+        backend = backend or self.backend_name
+        if model_path is None:
+            model_path = self.model_path if backend == self.backend_name else DEFAULT_MODEL_PATHS[backend]
+        with self._lock:
+            self._load(model_path, backend)
+        return self.info()
+
+    def _load(self, model_path, backend_name):
+        start = time.perf_counter()
+        if self.workers > 0:
+            backend = InferencePool(backend_name, model_path, num_workers=self.workers)
+        else:
+            backend = create_backend(backend_name, model_path)
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        warmup(backend)
+        warmup_seconds = time.perf_counter() - start
+
+        version = model_version(model_path)
+
+        if self.batching:
+            backend = MicroBatcher(backend, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+
+        # Tukar model setelah semuanya siap
+        old_backend = self.backend
+        self.backend = backend
+        self.backend_name = backend_name
+        self.model_path = model_path
+        self.version = version
+        self._snapshot = (backend, version)
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+        self.warmup_seconds = warmup_seconds
+        print(f"Model {version} ({backend_name}) loaded in {load_seconds:.2f}s (warmup {warmup_seconds:.2f}s)")
+
+        if old_backend is not None:
+            threading.Thread(target=retire_backend, args=(old_backend,), daemon=True).start()
+
+    def info(self):
+        backend = self.backend
+        return {
+            "loaded": self.backend is not None,
+            "backend": self.backend_name,
+            "model_path": self.model_path,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "batching": backend.stats() if isinstance(backend, MicroBatcher) else None,
+            "workers": inference_pool(backend).health() if inference_pool(backend) else None,
+        }
+
+
+def inference_pool(backend):
+    if isinstance(backend, MicroBatcher):
+        backend = backend.backend
+    return backend if isinstance(backend, InferencePool) else None
+
+
+def retire_backend(backend):
+    """
+    Menutup backend lama setelah reload: antrean micro-batch dihabiskan dulu,
+    lalu pool worker ditutup setelah request yang masih berjalan selesai
+    """
+    if isinstance(backend, MicroBatcher):
+        backend.close()
+        backend.join()
+        backend = backend.backend
+    if isinstance(backend, InferencePool):
+        time.sleep(backend.timeout)
+        backend.close()
+
+
+def warmup(backend):
+    """
+    Menjalankan inferensi dummy untuk setiap bucket batch supaya graph
+    sudah dikompilasi sebelum request pertama
+    """
+    for bucket in getattr(backend, 'buckets', (1,)):
+        backend.predict(np.zeros((bucket, 48, 48, 1), dtype=np.float32))
+
+
+model_registry = ModelRegistry(DEFAULT_MODEL_PATH)
+
+
+def predict_probabilities(backend, image):
+    """
+    Mengembalikan vektor probabilitas lengkap (5 kelas) untuk satu gambar
+    """
+    preprocessed_image = preprocess_image(image)
+    with stage_timer("infer"):
+        return backend.predict(preprocessed_image)[0]
+
+def get_emotion_prediction(backend, image):
+    """
+    Memprediksi emosi dari gambar
+    """
+    # Preprocess dan prediksi lewat fast path backend (Keras atau TFLite)
+    probabilities = predict_probabilities(backend, image)
+
+    # Ambil indeks dengan probabilitas tertinggi
+    predicted_class = np.argmax(probabilities)
+
+    # Ambil label emosi dan probabilitasnya
+    emotion = class_labels[predicted_class]
+    probability = probabilities[predicted_class]
+
+    return emotion, probability
+
+def predict_batch(backend, images):
+    """
+    Memprediksi emosi banyak gambar wajah sekaligus dalam satu forward pass
+    """
+    if len(images) == 0:
+        return []
+
+    batch = preprocess_images(images)
+    with stage_timer("infer"):
+        predictions = backend.predict(batch)
+
+    predicted_classes = np.argmax(predictions, axis=1)
+    return [
+        (class_labels[predicted_class], predictions[i][predicted_class])
+        for i, predicted_class in enumerate(predicted_classes)
+    ]
+
+def preprocess_image(image):
+    """
+    Memproses gambar untuk prediksi
+    """
+    with stage_timer("preprocess"):
+        return _preprocess_image(image)
+
+def _preprocess_image(image):
+    # Pastikan gambar dalam mode grayscale
+    if len(image.shape) == 3 and image.shape[2] == 3:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = image
+
+    # Resize ke ukuran 48x48
+    resized = cv2.resize(gray, (48, 48))
+
+    # Normalisasi (float32, sesuai input signature model)
+    normalized = resized.astype(np.float32) / 255.0
+
+    # Reshape untuk model
+    preprocessed = normalized.reshape((1, 48, 48, 1))
+    return preprocessed
+
+def preprocess_images(images):
+    """
+    Versi batch dari preprocess_image: hasilnya satu tensor (N, 48, 48, 1)
+    """
+    with stage_timer("preprocess"):
+        return _preprocess_images(images)
+
+def _preprocess_images(images):
+    batch = np.empty((len(images), 48, 48), dtype=np.uint8)
+    for i, image in enumerate(images):
+        # Pastikan gambar dalam mode grayscale
+        if len(image.shape) == 3 and image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        batch[i] = cv2.resize(image, (48, 48))
+
+    # Normalisasi dan reshape sekaligus untuk seluruh batch
+    return (batch.astype(np.float32) / 255.0).reshape((len(images), 48, 48, 1))
+
+class ReducedImage:
+    """
+    Gambar grayscale yang diperkecil saat decode untuk deteksi wajah.
+    Box wajah berada di koordinat gambar tereduksi; crop() memetakannya ke
+    gambar resolusi penuh bila wajah terlalu kecil untuk input 48x48.
+    """
+
+    def __init__(self, data, image, factor):
+        self.data = data
+        self.image = image
+        self.factor = factor
+        self._full = None
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def full(self):
+        if self._full is None:
+            self._full = cv2.imdecode(np.frombuffer(self.data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        return self._full
+
+    def crop(self, box):
+        x, y, w, h = box
+        if self.factor == 1 or min(w, h) >= CROP_MIN_SIZE:
+            return self.image[y:y+h, x:x+w]
+
+        full = self.full()
+        scale_x = full.shape[1] / self.image.shape[1]
+        scale_y = full.shape[0] / self.image.shape[0]
+        x, y = int(x * scale_x), int(y * scale_y)
+        w, h = int(round(w * scale_x)), int(round(h * scale_y))
+        return full[y:y+h, x:x+w]
+
+    def original_box(self, box):
+        """
+        Memetakan box dari gambar tereduksi ke koordinat gambar asli
+        """
+        return tuple(v * self.factor for v in box)
+
+
+def image_size(data):
+    """
+    Membaca ukuran gambar dari header saja (tanpa decode piksel)
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as header:
+            return header.size
+    except Exception:
+        return None
+
+def decode_reduced(data, max_side=DETECTION_MAX_SIDE):
+    """
+    Decode bytes gambar langsung ke grayscale dengan faktor reduksi (1/2/4/8)
+    sehingga sisi terpanjang tidak jauh di atas max_side. Mengembalikan
+    ReducedImage, atau None jika gambar tidak valid / melebihi MAX_IMAGE_PIXELS.
+    """
+    with stage_timer("decode"):
+        return _decode_reduced(data, max_side)
+
+def _decode_reduced(data, max_side):
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+
+    factor = 1
+    size = image_size(data)
+    if size is not None:
+        width, height = size
+        if width * height > MAX_IMAGE_PIXELS:
+            print(f"Image too large: {width}x{height}")
+            return None
+        for candidate in (8, 4, 2):
+            if max(width, height) / candidate >= max_side:
+                factor = candidate
+                break
+
+    image = cv2.imdecode(buffer, REDUCED_GRAYSCALE_FLAGS[factor])
+    if image is None:
+        return None
+    return ReducedImage(data, image, factor)
+
+def _crop(img, box):
+    if isinstance(img, ReducedImage):
+        return img.crop(box)
+    x, y, w, h = box
+    return img[y:y+h, x:x+w]
+
+def detect_faces(img):
+    """
+    Mendeteksi semua wajah pada array gambar (atau ReducedImage), hasilnya list (x, y, w, h)
+    """
+    if isinstance(img, ReducedImage):
+        img = img.image
+    with stage_timer("detect"):
+        return face_detector.detect(img)
+
+def crop_face(img):
+    """
+    Mendeteksi wajah pada array gambar dan mengembalikan potongan wajah pertama
+    """
+    faces = detect_faces(img)
+    if len(faces) == 0:
+        return None
+
+    return _crop(img, faces[0])
+
+def crop_faces(img, max_faces=MAX_FACES):
+    """
+    Mengembalikan semua wajah (maksimal max_faces, yang terbesar dulu)
+    sebagai list (box, crop)
+    """
+    faces = sorted(detect_faces(img), key=lambda box: box[2] * box[3], reverse=True)[:max_faces]
+    if isinstance(img, ReducedImage):
+        return [(img.original_box(box), img.crop(box)) for box in faces]
+    return [(box, _crop(img, box)) for box in faces]
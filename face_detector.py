@@ -0,0 +1,143 @@
+import cv2
+import os
+import time
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+# Engine deteksi wajah: 'haar' (default), 'lbp' (cascade LBP, lebih cepat) atau 'yunet' (DNN)
+DEFAULT_ENGINE = os.getenv('FACE_DETECTOR') or 'haar'
+SCALE_FACTOR = float(os.getenv('FACE_SCALE_FACTOR') or '1.1')
+MIN_NEIGHBORS = int(os.getenv('FACE_MIN_NEIGHBORS') or '5')
+MIN_SIZE = int(os.getenv('FACE_MIN_SIZE') or '30')
+SCORE_THRESHOLD = float(os.getenv('FACE_SCORE_THRESHOLD') or '0.8')
+
+# File model untuk engine selain haar harus tersedia secara lokal
+LBP_MODEL_PATH = os.getenv('FACE_LBP_MODEL') or 'lbpcascade_frontalface_improved.xml'
+YUNET_MODEL_PATH = os.getenv('FACE_YUNET_MODEL') or 'face_detection_yunet_2023mar.onnx'
+
+
+class CascadeEngine:
+    """
+    Deteksi wajah dengan cv2.CascadeClassifier (Haar atau LBP)
+    """
+
+    def __init__(self, cascade_path, scale_factor, min_neighbors, min_size):
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise ValueError(f"Failed to load cascade: {cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
+        faces = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size)
+        )
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+class YuNetEngine:
+    """
+    Deteksi wajah dengan detector DNN YuNet (cv2.FaceDetectorYN)
+    """
+
+    def __init__(self, model_path, score_threshold, min_size):
+        if not os.path.exists(model_path):
+            raise ValueError(f"YuNet model not found: {model_path}")
+        self.detector = cv2.FaceDetectorYN.create(model_path, "", (320, 320), score_threshold)
+        self.min_size = min_size
+        self.input_size = (320, 320)
+
+    def detect(self, img):
+        bgr = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if len(img.shape) == 2 else img
+        input_size = (bgr.shape[1], bgr.shape[0])
+        if input_size != self.input_size:
+            self.detector.setInputSize(input_size)
+            self.input_size = input_size
+
+        _, faces = self.detector.detect(bgr)
+        if faces is None:
+            return []
+
+        boxes = []
+        for face in faces:
+            x, y, w, h = (int(round(v)) for v in face[:4])
+            # Box YuNet bisa sedikit keluar dari gambar
+            x, y = max(x, 0), max(y, 0)
+            w, h = min(w, input_size[0] - x), min(h, input_size[1] - y)
+            if w >= self.min_size and h >= self.min_size:
+                boxes.append((x, y, w, h))
+        return boxes
+
+
+ENGINES = {
+    'haar': lambda d: CascadeEngine(cv2.data.haarcascades + "haarcascade_frontalface_alt.xml",
+                                    d.scale_factor, d.min_neighbors, d.min_size),
+    'lbp': lambda d: CascadeEngine(LBP_MODEL_PATH, d.scale_factor, d.min_neighbors, d.min_size),
+    'yunet': lambda d: YuNetEngine(YUNET_MODEL_PATH, d.score_threshold, d.min_size),
+}
+
+
+class FaceDetector:
+    """
+    Detector wajah yang dibuat sekali dan dipakai ulang. Instance engine
+    disimpan per thread karena objek OpenCV tidak aman dipakai bersamaan.
+    """
+
+    def __init__(self, engine=DEFAULT_ENGINE, scale_factor=SCALE_FACTOR, min_neighbors=MIN_NEIGHBORS,
+                 min_size=MIN_SIZE, score_threshold=SCORE_THRESHOLD):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown face detector engine: {engine}")
+        self.engine = engine
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.score_threshold = score_threshold
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.detections = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _get_engine(self):
+        engine = getattr(self._local, 'engine', None)
+        if engine is None:
+            engine = ENGINES[self.engine](self)
+            self._local.engine = engine
+        return engine
+
+    def detect(self, img):
+        """
+        Mendeteksi wajah pada gambar BGR atau grayscale, hasilnya list (x, y, w, h)
+        """
+        engine = self._get_engine()
+
+        start = time.perf_counter()
+        faces = engine.detect(img)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.detections += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+        return faces
+
+    def info(self):
+        with self._lock:
+            return {
+                "engine": self.engine,
+                "scale_factor": self.scale_factor,
+                "min_neighbors": self.min_neighbors,
+                "min_size": self.min_size,
+                "score_threshold": self.score_threshold,
+                "detections": self.detections,
+                "average_ms": self.total_seconds / self.detections * 1000.0 if self.detections else 0.0,
+                "max_ms": self.max_seconds * 1000.0,
+            }
+
+
+face_detector = FaceDetector()
@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+import time
+import uuid
+
+
+class JobQueue:
+    """
+    Antrean job in-process: submit() langsung mengembalikan job id, thread
+    background menjalankan job-nya, dan hasilnya disimpan sampai TTL habis.
+
+    Payload besar (upload) disimpan di file spool, bukan di memori; antrean
+    dibatasi jumlah job dan total ukuran file spool.
+
+    Antrean dan status job hanya ada di satu proses: dengan beberapa worker
+    gunicorn, GET /jobs/<id> hanya ditemukan di proses yang menerima submit,
+    dan di deployment serverless thread tidak hidup lebih lama dari request.
+    Jalankan dengan satu proses web (mis. gunicorn -w 1 --threads N).
+    """
+
+    def __init__(self, workers=2, ttl_seconds=3600, max_queued=100, max_queued_bytes=512 * 1024 * 1024):
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self.max_queued_bytes = max_queued_bytes
+        self.queued_bytes = 0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        # Thread dibuat saat job pertama masuk, bukan saat import
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"emotion-job-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, spool_path=None, **kwargs):
+        """
+        Mengembalikan job id, atau None jika antrean penuh (jumlah job atau
+        total byte). spool_path: file payload job, dihapus setelah job selesai;
+        jika job ditolak, file tetap milik pemanggil.
+        """
+        size = os.path.getsize(spool_path) if spool_path else 0
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            self._start()
+            self._purge()
+            if self.queued_bytes + size > self.max_queued_bytes:
+                return None
+            try:
+                self._queue.put_nowait((job_id, fn, args, kwargs, spool_path, size))
+            except queue.Full:
+                return None
+            self.queued_bytes += size
+            self._jobs[job_id] = job
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _purge(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job_id, fn, args, kwargs, spool_path, size = self._queue.get()
+            with self._lock:
+                job = self._jobs[job_id]
+                job["status"] = "running"
+                job["started_at"] = time.time()
+
+            try:
+                result = fn(*args, **kwargs)
+                status, error = "done", None
+            except Exception as e:
+                print(f"Error in job {job_id}: {str(e)}")
+                result, status, error = None, "failed", str(e)
+            finally:
+                if spool_path:
+                    try:
+                        os.remove(spool_path)
+                    except OSError as e:
+                        print(f"Error removing spool file of job {job_id}: {str(e)}")
+
+            with self._lock:
+                self.queued_bytes -= size
+                job["result"] = result
+                job["error"] = error
+                job["status"] = status
+                job["finished_at"] = time.time()
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queued_bytes": self.queued_bytes,
+                "workers": self.workers,
+                "jobs": statuses,
+            }
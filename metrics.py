@@ -0,0 +1,141 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels_text(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Histogram kumulatif dengan bucket tetap (format Prometheus)
+    """
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(label_values)
+            if counts is None:
+                # [count per bucket..., +Inf, sum]
+                counts = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        labels = self.labels + ("le",)
+        with self._lock:
+            for label_values, counts in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts[:-1]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels_text(labels, label_values + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels_text(self.labels, label_values)} {counts[-1]}")
+                lines.append(f"{self.name}_count{_labels_text(self.labels, label_values)} {cumulative}")
+        return lines
+
+
+class Gauges:
+    """
+    Gauge yang nilainya diambil saat /metrics di-scrape (statistik cache, batch, dll.)
+    """
+
+    def __init__(self):
+        self._collectors = []
+
+    def register(self, collector):
+        """
+        collector() mengembalikan list (nama, help, nilai)
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for collector in self._collectors:
+            try:
+                values = collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+                continue
+            for name, help, value in values:
+                if value is None:
+                    continue
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {float(value)}")
+        return lines
+
+
+requests_total = Counter("http_requests_total", "HTTP requests per route", ("method", "route", "status"))
+request_seconds = Histogram("http_request_duration_seconds", "HTTP request latency per route", ("method", "route"))
+stage_seconds = Histogram("emotion_stage_duration_seconds", "Prediction pipeline stage latency", ("stage",))
+db_queries = Histogram("db_queries_per_request", "Database queries per request", ("route",), buckets=COUNT_BUCKETS)
+gauges = Gauges()
+
+
+@contextmanager
+def stage_timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage)
+
+
+# Waktu import/inisialisasi per subsistem (ms), untuk laporan startup
+startup_timings = {}
+
+
+@contextmanager
+def startup_timer(subsystem):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[subsystem] = startup_timings.get(subsystem, 0.0) + (time.perf_counter() - start) * 1000.0
+
+
+def render():
+    lines = []
+    for metric in (requests_total, request_seconds, stage_seconds, db_queries, gauges):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
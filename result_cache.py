@@ -0,0 +1,115 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(data):
+    """
+    Hash isi file upload (bytes)
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(face):
+    """
+    dHash 64-bit dari potongan wajah grayscale: gambar yang hanya beda
+    encoding/kompresi tetap menghasilkan hash yang sama
+    """
+    import cv2
+    import numpy as np
+
+    if len(face.shape) == 3:
+        face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(face, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+
+class ResultCache:
+    """
+    Cache hasil prediksi dengan eviction LRU, TTL dan batas memori.
+    Seluruh isi cache dibuang saat versi model berubah.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=600, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = None
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _sync_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.bytes = 0
+            self.version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._sync_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version):
+        size = len(key) + len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._sync_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self.bytes += size
+
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "model_version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,194 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def iter_paths(root=None, file_list=None):
+    """
+    Yields image paths in a stable order so a checkpoint index stays valid
+    between runs
+    """
+    if file_list:
+        with open(file_list) as f:
+            for line in f:
+                path = line.strip()
+                if path:
+                    yield path
+        return
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.join(dirpath, filename)
+
+
+def prepare(path):
+    """
+    Worker: decode and crop one image. Returns (path, 48x48 crop or None, error)
+    """
+    import cv2
+    from emotion import decode_reduced, crop_face
+
+    try:
+        with open(path, "rb") as f:
+            img = decode_reduced(f.read())
+        if img is None:
+            return path, None, "unreadable image"
+        face = crop_face(img)
+        if face is None:
+            return path, None, "no face detected"
+        # Only the small crop travels back to the main process
+        return path, cv2.resize(face, (48, 48)), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+class Writer:
+    def __init__(self, path, fmt, append):
+        from emotion import class_labels
+
+        self.class_labels = class_labels
+        self.fmt = fmt
+        self.file = open(path, "a" if append else "w", newline="")
+        self.fields = ["path", "emotion", "percentage", "error"] + [label.lower() for label in class_labels]
+        if fmt == "csv":
+            self.csv = csv.DictWriter(self.file, fieldnames=self.fields)
+            if not append:
+                self.csv.writeheader()
+
+    def write(self, row):
+        if self.fmt == "csv":
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + "\n")
+
+    def flush(self):
+        """
+        Writes everything to disk and returns the output size in bytes
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def read_checkpoint(path):
+    """
+    Returns (images done, output size in bytes when they were done)
+    """
+    if not os.path.exists(path):
+        return 0, None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    return checkpoint["done"], checkpoint.get("offset")
+
+
+def write_checkpoint(path, done, offset):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"done": done, "offset": offset}, f)
+    os.replace(tmp, path)
+
+
+def truncate_output(path, offset):
+    """
+    Drops rows written after the last checkpoint (a run killed mid-chunk can
+    leave part of a chunk, possibly a cut-off row, on disk)
+    """
+    if offset is not None and os.path.exists(path):
+        with open(path, "r+b") as f:
+            f.truncate(offset)
+
+
+def score_chunk(backend, prepared, writer):
+    import numpy as np
+    from emotion import preprocess_images
+
+    crops = [crop for _, crop, _ in prepared if crop is not None]
+    probabilities = iter(backend.predict(preprocess_images(crops)) if crops else [])
+
+    for path, crop, error in prepared:
+        row = {"path": path, "emotion": "", "percentage": "", "error": error or ""}
+        if crop is not None:
+            probs = next(probabilities)
+            predicted_class = int(np.argmax(probs))
+            row["emotion"] = writer.class_labels[predicted_class]
+            row["percentage"] = round(float(probs[predicted_class]) * 100, 1)
+            for label, prob in zip(writer.class_labels, probs):
+                row[label.lower()] = round(float(prob), 4)
+        writer.write(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a directory of images with the emotion model")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Folder to walk for images")
+    source.add_argument("--file-list", help="Text file with one image path per line")
+    parser.add_argument("--output", required=True, help="Result file, .csv or .jsonl")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--model", help="Model file (default: EMOTION_MODEL_PATH)")
+    parser.add_argument("--backend", help="keras or tflite (default: EMOTION_BACKEND)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Decode/detect processes")
+    parser.add_argument("--batch-size", type=int, default=64, help="Crops per forward pass")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    args = parser.parse_args()
+
+    fmt = "csv" if args.output.endswith(".csv") else "jsonl"
+    checkpoint = args.checkpoint or args.output + ".checkpoint"
+    done, offset = (0, None) if args.restart else read_checkpoint(checkpoint)
+    if done:
+        truncate_output(args.output, offset)
+
+    # Start the workers before TensorFlow is loaded in this process
+    pool = multiprocessing.get_context("spawn").Pool(args.workers)
+
+    from emotion import DEFAULT_BACKEND, DEFAULT_MODEL_PATHS, DEFAULT_MODEL_PATH, create_backend, warmup
+    backend_name = args.backend or DEFAULT_BACKEND
+    model_path = args.model or (DEFAULT_MODEL_PATH if backend_name == DEFAULT_BACKEND else DEFAULT_MODEL_PATHS[backend_name])
+    backend = create_backend(backend_name, model_path)
+    warmup(backend)
+
+    writer = Writer(args.output, fmt, append=done > 0)
+    paths = itertools.islice(iter_paths(args.dir, args.file_list), done, None)
+    if done:
+        print(f"Resuming after {done} images", file=sys.stderr)
+
+    # Work in fixed-size chunks so memory stays bounded however large the archive is
+    chunk_size = args.batch_size * max(1, args.workers) * 2
+    start = time.perf_counter()
+    scored = 0
+    try:
+        while True:
+            chunk = list(itertools.islice(paths, chunk_size))
+            if not chunk:
+                break
+
+            prepared = pool.map(prepare, chunk, chunksize=max(1, len(chunk) // (args.workers * 4)))
+            for offset in range(0, len(prepared), args.batch_size):
+                score_chunk(backend, prepared[offset:offset + args.batch_size], writer)
+
+            offset = writer.flush()
+            done += len(chunk)
+            scored += len(chunk)
+            write_checkpoint(checkpoint, done, offset)
+
+            elapsed = time.perf_counter() - start
+            print(f"{done} images done ({scored / elapsed:.1f} images/s)", file=sys.stderr)
+    finally:
+        writer.close()
+        pool.close()
+        pool.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# Konfigurasi harus ada sebelum app diimpor (database dibuat saat import)
+_db_dir = tempfile.mkdtemp()
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("UPLOAD_FOLDER", _db_dir)
+os.environ.setdefault("ALLOWED_EXTENSIONS", "png,jpg,jpeg")
+
+from app import (
+    app, db, User, Reservation, Notification, Table,
+    encode_cursor, decode_cursor, decode_timestamp_cursor,
+)
+
+
+@pytest.fixture
+def client():
+    with app.test_client() as client:
+        yield client
+
+
+def signup(client, username):
+    return client.post("/signup", json={
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": "secret",
+    })
+
+
+def reservation_payload(user_id, reservation_id, table_id=1, date="2030-01-01", time="19:00"):
+    return {
+        "id": reservation_id,
+        "user_id": user_id,
+        "date": date,
+        "time": time,
+        "name": "Test",
+        "phone": "0800",
+        "email": "test@example.com",
+        "guest_count": 2,
+        "table_id": table_id,
+        "transaction_id": f"trx-{reservation_id}",
+    }
+
+
+def test_signup_creates_user(client):
+    response = signup(client, "alice")
+
+    assert response.status_code == 201
+    with app.app_context():
+        assert User.query.filter_by(username="alice").count() == 1
+
+
+def test_availability_marks_booked_slot(client):
+    signup(client, "carol")
+    with app.app_context():
+        user_id = User.query.filter_by(username="carol").first().id
+    client.post("/reservations", json=reservation_payload(user_id, "res-3", table_id=2, date="2030-02-01"))
+
+    response = client.get("/availability?date=2030-02-01")
+    assert response.status_code == 200
+    grid = response.get_json()["availability"]["2030-02-01"]
+    assert grid["2"]["19:00"] is False
+    assert grid["1"]["19:00"] is True
+
+    response = client.get("/availability?date=2030-02-01", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+
+def test_create_reservation_writes_notification_and_rejects_double_booking(client):
+    signup(client, "bob")
+    with app.app_context():
+        user_id = User.query.filter_by(username="bob").first().id
+
+    response = client.post("/reservations", json=reservation_payload(user_id, "res-1"))
+    assert response.status_code == 201
+
+    response = client.post("/reservations", json=reservation_payload(user_id, "res-2"))
+    assert response.status_code == 409
+
+    with app.app_context():
+        assert Reservation.query.filter_by(table_id=1, date="2030-01-01", time="19:00").count() == 1
+        assert Notification.query.filter_by(user_id=user_id).count() == 1
+
+
+def test_table_catalog_is_invalidated_on_table_write(client):
+    response = client.get("/getAllTables")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    assert client.get("/getAllTables", headers={"If-None-Match": etag}).status_code == 304
+
+    with app.app_context():
+        db.session.add(Table(table_number="Z9", capacity=2, location="Test"))
+        db.session.commit()
+
+    response = client.get("/getAllTables", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Z9" in [table["table_number"] for table in response.get_json()["tables"]]
+
+
+def test_cursor_roundtrip():
+    moment = datetime(2030, 1, 1, 19, 30, 15, 123456)
+    cursor = encode_cursor(moment, 42)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == [moment.isoformat(), 42]
+    assert decode_timestamp_cursor(cursor) == (moment, 42)
+
+
+def test_decode_timestamp_cursor_rejects_invalid_values():
+    assert decode_cursor("not base64 json!") is None
+    assert decode_timestamp_cursor("not base64 json!") is None
+    assert decode_timestamp_cursor(encode_cursor("2030-01-01")) is None
+    assert decode_timestamp_cursor(encode_cursor("2030-01-01", "42")) is None
+    assert decode_timestamp_cursor(encode_cursor("2030-01-01", True)) is None
+    assert decode_timestamp_cursor(encode_cursor("yesterday", 42)) is None
+
+
+def test_reviews_are_paginated_and_summarised(client):
+    signup(client, "dave")
+    with app.app_context():
+        user_id = User.query.filter_by(username="dave").first().id
+
+    for rating in (5, 4, 3):
+        response = client.post("/review", json={"user_id": user_id, "rating": rating, "comment": "ok"})
+        assert response.status_code == 201
+    assert client.post("/review", json={"user_id": user_id, "rating": 6}).status_code == 400
+
+    first = client.get("/reviews?limit=2").get_json()
+    assert [review["rating"] for review in first["reviews"]] == [3, 4]
+    assert first["stats"]["count"] == 3
+    assert first["stats"]["average"] == 4.0
+    assert first["stats"]["distribution"]["5"] == 1
+
+    second = client.get(f"/reviews?limit=2&cursor={first['next_cursor']}").get_json()
+    assert [review["rating"] for review in second["reviews"]] == [5]
+    assert second["next_cursor"] is None
+
+    assert client.get("/reviews?cursor=garbage").status_code == 400
+
+
+def test_ensure_indexes_command():
+    result = app.test_cli_runner().invoke(args=["ensure-indexes"])
+
+    assert result.exit_code == 0
+    assert "Indexes are up to date." in result.output
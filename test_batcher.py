@@ -0,0 +1,110 @@
+import threading
+
+import numpy as np
+import pytest
+
+from batcher import MicroBatcher
+
+
+class FakeBackend:
+    name = "fake"
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    def predict(self, batch):
+        self.calls.append(len(batch))
+        if self.error:
+            raise self.error
+        return batch.reshape(len(batch), -1) * 2
+
+
+def predict_concurrently(batcher, tensors):
+    results = [None] * len(tensors)
+    errors = [None] * len(tensors)
+    barrier = threading.Barrier(len(tensors))
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = batcher.predict(tensors[index])
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(len(tensors))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_concurrent_requests_share_one_batch_and_get_their_own_rows():
+    backend = FakeBackend()
+    # Batch penuh tepat saat semua request masuk, jadi tidak menunggu max_wait
+    batcher = MicroBatcher(backend, max_batch_size=6, max_wait_ms=2000)
+    tensors = [np.full((index + 1, 1), index, dtype=np.float32) for index in range(3)]
+
+    results, errors = predict_concurrently(batcher, tensors)
+
+    assert errors == [None, None, None]
+    assert backend.calls == [6]
+    for index, result in enumerate(results):
+        assert result.shape == (index + 1, 1)
+        assert (result == index * 2).all()
+
+    stats = batcher.stats()
+    assert stats["requests"] == 3
+    assert stats["batches"] == 1
+    assert stats["rows"] == 6
+    assert stats["largest_batch"] == 6
+    assert stats["batch_sizes"] == {6: 1}
+    batcher.close()
+    batcher.join(5)
+
+
+def test_backend_error_is_raised_in_every_caller():
+    batcher = MicroBatcher(FakeBackend(error=ValueError("boom")), max_batch_size=2, max_wait_ms=2000)
+    tensors = [np.zeros((1, 1), dtype=np.float32) for _ in range(2)]
+
+    _, errors = predict_concurrently(batcher, tensors)
+
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert batcher.stats()["batches"] == 0
+    batcher.close()
+    batcher.join(5)
+
+
+def test_closed_batcher_forwards_to_backend():
+    backend = FakeBackend()
+    batcher = MicroBatcher(backend, max_batch_size=4, max_wait_ms=1)
+    batcher.close()
+    batcher.join(5)
+
+    result = batcher.predict(np.ones((2, 1), dtype=np.float32))
+
+    assert (result == 2).all()
+    assert backend.calls == [2]
+    assert batcher.stats()["requests"] == 0
+
+
+def test_name_comes_from_backend():
+    batcher = MicroBatcher(FakeBackend())
+    assert batcher.name == "fake"
+    batcher.close()
+    batcher.join(5)
+    assert not batcher._thread.is_alive()
+
+
+@pytest.mark.parametrize("rows", [1, 3])
+def test_single_request_is_flushed_after_max_wait(rows):
+    backend = FakeBackend()
+    batcher = MicroBatcher(backend, max_batch_size=32, max_wait_ms=5)
+
+    result = batcher.predict(np.ones((rows, 1), dtype=np.float32))
+
+    assert result.shape == (rows, 1)
+    assert backend.calls == [rows]
+    batcher.close()
+    batcher.join(5)
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+from jobs import JobQueue
+
+
+def spool(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def wait_for(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_result_is_stored_and_spool_file_removed(tmp_path):
+    queue = JobQueue(workers=1)
+    path = spool(tmp_path, "upload.bin", 10)
+
+    job_id = queue.submit(os.path.getsize, path, spool_path=path)
+    job = wait_for(queue, job_id)
+
+    assert job["status"] == "done"
+    assert job["result"] == 10
+    assert not os.path.exists(path)
+    assert queue.stats()["queued_bytes"] == 0
+
+
+def test_failed_job_records_error_and_removes_spool_file(tmp_path):
+    def fail():
+        raise ValueError("bad image")
+
+    queue = JobQueue(workers=1)
+    path = spool(tmp_path, "upload.bin", 10)
+
+    job = wait_for(queue, queue.submit(fail, spool_path=path))
+
+    assert job["status"] == "failed"
+    assert job["error"] == "bad image"
+    assert not os.path.exists(path)
+    assert queue.stats()["queued_bytes"] == 0
+
+
+def test_submit_over_byte_cap_is_rejected_and_file_kept(tmp_path):
+    release = threading.Event()
+    queue = JobQueue(workers=1, max_queued_bytes=15)
+    first = spool(tmp_path, "first.bin", 10)
+    second = spool(tmp_path, "second.bin", 10)
+
+    job_id = queue.submit(release.wait, 5, spool_path=first)
+    assert queue.stats()["queued_bytes"] == 10
+
+    assert queue.submit(release.wait, 5, spool_path=second) is None
+    assert os.path.exists(second)
+
+    release.set()
+    wait_for(queue, job_id)
+    assert queue.stats()["queued_bytes"] == 0
+    assert queue.submit(os.path.getsize, second, spool_path=second) is not None
+
+
+def test_submit_over_job_count_is_rejected():
+    release = threading.Event()
+    queue = JobQueue(workers=1, max_queued=1)
+
+    running = queue.submit(release.wait, 5)
+    # Tunggu job pertama diambil worker supaya antrean kosong lagi
+    while queue.get(running)["status"] != "running":
+        time.sleep(0.01)
+
+    assert queue.submit(release.wait, 5) is not None
+    assert queue.submit(release.wait, 5) is None
+    release.set()
+
+
+def test_finished_jobs_expire_after_ttl():
+    queue = JobQueue(workers=1, ttl_seconds=0.2)
+    job_id = queue.submit(lambda: 1)
+    assert wait_for(queue, job_id)["result"] == 1
+
+    time.sleep(0.3)
+    assert queue.get(job_id) is None
@@ -0,0 +1,67 @@
+import result_cache
+from result_cache import ResultCache, content_hash
+
+
+def test_content_hash_depends_only_on_bytes():
+    assert content_hash(b"abc") == content_hash(b"abc")
+    assert content_hash(b"abc") != content_hash(b"abd")
+
+
+def test_get_returns_stored_value_for_same_version():
+    cache = ResultCache()
+    cache.put("a", {"emotion": "Happy"}, "v1")
+
+    assert cache.get("a", "v1") == {"emotion": "Happy"}
+    assert cache.get("b", "v1") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1, "v1")
+    cache.put("b", 2, "v1")
+    cache.get("a", "v1")
+    cache.put("c", 3, "v1")
+
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") == 1
+    assert cache.get("c", "v1") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl_seconds=10)
+    cache.put("a", 1, "v1")
+
+    now[0] += 5
+    assert cache.get("a", "v1") == 1
+    now[0] += 10
+    assert cache.get("a", "v1") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["bytes"] == 0
+
+
+def test_byte_cap_evicts_oldest_and_skips_oversized_values():
+    cache = ResultCache(max_bytes=30)
+    cache.put("a", "x" * 10, "v1")
+    cache.put("b", "y" * 10, "v1")
+    cache.put("c", "z" * 10, "v1")
+
+    assert cache.get("a", "v1") is None
+    assert cache.stats()["bytes"] <= 30
+
+    cache.put("big", "x" * 100, "v1")
+    assert cache.get("big", "v1") is None
+
+
+def test_new_model_version_drops_all_entries():
+    cache = ResultCache()
+    cache.put("a", 1, "v1")
+
+    assert cache.get("a", "v2") is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["model_version"] == "v2"
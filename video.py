@@ -0,0 +1,175 @@
+import cv2
+import numpy as np
+from emotion import class_labels, preprocess_images, DETECTION_MAX_SIDE
+from face_detector import face_detector
+from metrics import stage_timer
+
+# Skor minimum template matching agar wajah dianggap masih terlacak
+TRACK_MIN_SCORE = 0.5
+# Batas overlap (IoU) untuk mencocokkan deteksi keyframe dengan track yang ada
+TRACK_MIN_IOU = 0.3
+# Jumlah crop per forward pass
+INFERENCE_BATCH_SIZE = 64
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    x1, y1 = max(ax, bx), max(ay, by)
+    x2, y2 = min(ax + aw, bx + bw), min(ay + ah, by + bh)
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union else 0.0
+
+
+class FaceTrack:
+    """
+    Satu wajah yang dilacak antar frame dengan template matching
+    di sekitar posisi terakhirnya
+    """
+
+    def __init__(self, face_id, box, frame):
+        self.face_id = face_id
+        self.update(box, frame)
+
+    def update(self, box, frame):
+        x, y, w, h = box
+        self.box = box
+        self.template = frame[y:y+h, x:x+w].copy()
+
+    def track(self, frame):
+        x, y, w, h = self.box
+        frame_h, frame_w = frame.shape[:2]
+
+        # Cari di area sekitar posisi terakhir (setengah ukuran wajah ke tiap sisi)
+        sx1, sy1 = max(0, x - w // 2), max(0, y - h // 2)
+        sx2, sy2 = min(frame_w, x + w + w // 2), min(frame_h, y + h + h // 2)
+        region = frame[sy1:sy2, sx1:sx2]
+        if region.shape[0] < h or region.shape[1] < w:
+            return False
+
+        result = cv2.matchTemplate(region, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (mx, my) = cv2.minMaxLoc(result)
+        if score < TRACK_MIN_SCORE:
+            return False
+
+        self.update((sx1 + mx, sy1 + my, w, h), frame)
+        return True
+
+
+def analyze_video(video_path, get_backend, sample_fps=2.0, keyframe_interval=5, smoothing=0.0,
+                  max_faces=10, max_seconds=300):
+    """
+    Membuat timeline emosi per wajah dari file video.
+    Frame diambil sebanyak sample_fps per detik; deteksi wajah penuh hanya
+    dijalankan setiap keyframe_interval frame sampel, di antaranya wajah
+    dilacak. smoothing (0..1) adalah bobot EMA pada probabilitas per wajah.
+    truncated pada hasil bernilai True jika video lebih panjang dari max_seconds.
+    get_backend() baru dipanggil saat inferensi, setelah semua frame dibaca,
+    supaya reload model selama decode tidak membuat video memakai backend
+    yang sudah ditutup.
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        return None
+
+    try:
+        video_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(1, int(round(video_fps / sample_fps)))
+        max_frames = int(max_seconds * video_fps)
+
+        tracks = []
+        next_face_id = 1
+        samples = []  # (face_id, t, box asli, crop 48x48)
+        frame_index = 0
+        sampled = 0
+        keyframes = 0
+
+        while frame_index < max_frames:
+            # grab() tidak men-decode frame, retrieve() hanya untuk frame sampel
+            if not capture.grab():
+                break
+            if frame_index % step != 0:
+                frame_index += 1
+                continue
+
+            with stage_timer("decode"):
+                ok, frame = capture.retrieve()
+            if not ok:
+                break
+
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            scale = min(1.0, DETECTION_MAX_SIDE / max(gray.shape))
+            if scale < 1.0:
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+            if sampled % keyframe_interval == 0:
+                keyframes += 1
+                with stage_timer("detect"):
+                    faces = face_detector.detect(gray)
+                detections = sorted(faces, key=lambda box: box[2] * box[3], reverse=True)
+                matched = []
+                for box in detections[:max_faces]:
+                    best = max(tracks, key=lambda track: iou(track.box, box), default=None)
+                    if best is not None and best not in matched and iou(best.box, box) >= TRACK_MIN_IOU:
+                        best.update(box, gray)
+                        matched.append(best)
+                    else:
+                        track = FaceTrack(next_face_id, box, gray)
+                        next_face_id += 1
+                        matched.append(track)
+                tracks = matched
+            else:
+                with stage_timer("track"):
+                    tracks = [track for track in tracks if track.track(gray)]
+
+            t = round(frame_index / video_fps, 3)
+            for track in tracks:
+                x, y, w, h = track.box
+                original_box = tuple(int(round(v / scale)) for v in track.box)
+                # Simpan crop yang sudah 48x48 supaya frame lama tidak tertahan di memori
+                samples.append((track.face_id, t, original_box, cv2.resize(gray[y:y+h, x:x+w], (48, 48))))
+
+            sampled += 1
+            frame_index += 1
+
+        # Berhenti karena batas max_seconds, bukan karena video habis
+        truncated = frame_index >= max_frames and capture.grab()
+    finally:
+        capture.release()
+
+    # Semua crop diproses dalam batch
+    backend = get_backend()
+    probabilities = []
+    for start in range(0, len(samples), INFERENCE_BATCH_SIZE):
+        crops = [crop for _, _, _, crop in samples[start:start + INFERENCE_BATCH_SIZE]]
+        batch = preprocess_images(crops)
+        with stage_timer("infer"):
+            probabilities.extend(backend.predict(batch))
+
+    timelines = {}
+    smoothed = {}
+    for (face_id, t, (x, y, w, h), _), probs in zip(samples, probabilities):
+        if smoothing > 0 and face_id in smoothed:
+            probs = smoothing * smoothed[face_id] + (1 - smoothing) * probs
+        smoothed[face_id] = probs
+
+        predicted_class = int(np.argmax(probs))
+        timelines.setdefault(face_id, []).append({
+            "t": t,
+            "box": {"x": x, "y": y, "w": w, "h": h},
+            "emotion": class_labels[predicted_class],
+            "percentage": round(float(probs[predicted_class]) * 100, 1)
+        })
+
+    return {
+        "fps": video_fps,
+        "sample_fps": video_fps / step,
+        "frames_sampled": sampled,
+        "keyframes": keyframes,
+        "truncated": bool(truncated),
+        "faces": [
+            {"face_id": face_id, "timeline": timeline}
+            for face_id, timeline in sorted(timelines.items())
+        ]
+    }
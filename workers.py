@@ -0,0 +1,238 @@
+import multiprocessing
+import queue
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+INPUT_SHAPE = (48, 48, 1)
+NUM_CLASSES = 5
+
+
+def _worker_main(backend_name, model_path, input_name, output_name, max_batch_size, conn):
+    """
+    Proses worker: memuat backend sendiri lalu menunggu perintah dari pipe.
+    Data gambar dan hasil dipertukarkan lewat shared memory, pipe hanya
+    membawa jumlah baris.
+    """
+    from emotion import create_backend, warmup
+
+    backend = create_backend(backend_name, model_path)
+    warmup(backend)
+
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    inputs = np.ndarray((max_batch_size,) + INPUT_SHAPE, dtype=np.float32, buffer=input_shm.buf)
+    outputs = np.ndarray((max_batch_size, NUM_CLASSES), dtype=np.float32, buffer=output_shm.buf)
+    conn.send(("ready", None))
+
+    try:
+        while True:
+            command, rows = conn.recv()
+            if command == "stop":
+                break
+            if command == "ping":
+                conn.send(("pong", None))
+                continue
+            try:
+                outputs[:rows] = backend.predict(inputs[:rows])
+                conn.send(("ok", rows))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    finally:
+        del inputs, outputs
+        input_shm.close()
+        output_shm.close()
+
+
+class Worker:
+    """
+    Satu proses inferensi beserta buffer shared memory-nya
+    """
+
+    def __init__(self, index, pool):
+        self.index = index
+        self.pool = pool
+        self.restarts = -1
+        self.jobs = 0
+        self.process = None
+        self.input_shm = shared_memory.SharedMemory(
+            create=True, size=pool.max_batch_size * int(np.prod(INPUT_SHAPE)) * 4
+        )
+        self.output_shm = shared_memory.SharedMemory(create=True, size=pool.max_batch_size * NUM_CLASSES * 4)
+        self.inputs = np.ndarray((pool.max_batch_size,) + INPUT_SHAPE, dtype=np.float32, buffer=self.input_shm.buf)
+        self.outputs = np.ndarray((pool.max_batch_size, NUM_CLASSES), dtype=np.float32, buffer=self.output_shm.buf)
+        self.start()
+
+    def start(self):
+        self.conn, child_conn = self.pool.context.Pipe()
+        self.process = self.pool.context.Process(
+            target=_worker_main,
+            args=(self.pool.backend_name, self.pool.model_path, self.input_shm.name,
+                  self.output_shm.name, self.pool.max_batch_size, child_conn),
+            name=f"emotion-worker-{self.index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.restarts += 1
+
+        if not self.conn.poll(self.pool.start_timeout):
+            raise RuntimeError(f"Worker {self.index} did not start in {self.pool.start_timeout}s")
+        self.conn.recv()
+
+    def restart(self):
+        print(f"Restarting inference worker {self.index}")
+        self.stop(timeout=1)
+        self.start()
+
+    def stop(self, timeout=5):
+        if self.process is None:
+            return
+        try:
+            if self.process.is_alive():
+                self.conn.send(("stop", None))
+                self.process.join(timeout)
+        except (BrokenPipeError, EOFError, OSError):
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+
+    def request(self, command, rows, timeout):
+        self.conn.send((command, rows))
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"Worker {self.index} did not answer in {timeout}s")
+        return self.conn.recv()
+
+    def predict(self, batch):
+        rows = len(batch)
+        self.inputs[:rows] = batch
+        status, value = self.request("predict", rows, self.pool.timeout)
+        if status == "error":
+            raise RuntimeError(value)
+        self.jobs += 1
+        return self.outputs[:rows].copy()
+
+    def healthy(self):
+        if not self.process.is_alive():
+            return False
+        try:
+            status, _ = self.request("ping", None, self.pool.ping_timeout)
+            return status == "pong"
+        except (BrokenPipeError, EOFError, OSError, TimeoutError):
+            return False
+
+    def close(self):
+        self.stop()
+        del self.inputs, self.outputs
+        for shm in (self.input_shm, self.output_shm):
+            shm.close()
+            shm.unlink()
+
+
+class InferencePool:
+    """
+    Pool proses inferensi, masing-masing memegang model sendiri, sehingga
+    inferensi bisa memakai semua core tanpa membebani thread request Flask.
+    Dipakai sebagai backend: predict(batch) meminjam satu worker yang idle.
+    Worker yang mati atau macet otomatis di-restart.
+
+    Proses worker dibuat dengan metode 'spawn' (TensorFlow tidak aman
+    di-fork), jadi jalankan aplikasi lewat WSGI server (gunicorn, dsb.).
+    """
+
+    def __init__(self, backend_name, model_path, num_workers=2, max_batch_size=64,
+                 timeout=30.0, health_interval=10.0):
+        self.name = backend_name
+        self.backend_name = backend_name
+        self.model_path = model_path
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self.ping_timeout = 2.0
+        self.start_timeout = 120.0
+        self.context = multiprocessing.get_context("spawn")
+
+        self.workers = [Worker(index, self) for index in range(num_workers)]
+        self._idle = queue.Queue()
+        for worker in self.workers:
+            self._idle.put(worker)
+
+        self._closed = threading.Event()
+        self._monitor = threading.Thread(
+            target=self._health_loop, args=(health_interval,), name="emotion-worker-health", daemon=True
+        )
+        self._monitor.start()
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        if len(batch) > self.max_batch_size:
+            return np.concatenate([
+                self.predict(batch[start:start + self.max_batch_size])
+                for start in range(0, len(batch), self.max_batch_size)
+            ])
+
+        worker = self._acquire()
+        try:
+            return worker.predict(batch)
+        except (BrokenPipeError, EOFError, OSError, TimeoutError):
+            # Worker crash atau macet: restart lalu coba sekali lagi
+            worker.restart()
+            return worker.predict(batch)
+        finally:
+            self._idle.put(worker)
+
+    def _acquire(self):
+        """
+        Meminjam worker idle. Setelah close() (mis. pool lama setelah reload
+        model) worker tidak pernah kembali, jadi pemanggil mendapat error
+        alih-alih menunggu selamanya.
+        """
+        while True:
+            if self._closed.is_set():
+                raise RuntimeError("Inference pool is closed")
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _health_loop(self, interval):
+        while not self._closed.wait(interval):
+            self.check_health()
+
+    def check_health(self):
+        """
+        Ping semua worker yang sedang idle dan restart yang tidak merespons
+        """
+        checked = []
+        while True:
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            for worker in checked:
+                if not worker.healthy():
+                    worker.restart()
+        finally:
+            for worker in checked:
+                self._idle.put(worker)
+
+    def health(self):
+        return [
+            {
+                "index": worker.index,
+                "pid": worker.process.pid,
+                "alive": worker.process.is_alive(),
+                "jobs": worker.jobs,
+                "restarts": worker.restarts,
+            }
+            for worker in self.workers
+        ]
+
+    def close(self):
+        self._closed.set()
+        for _ in self.workers:
+            worker = self._idle.get()
+            worker.close()